@@ -9,7 +9,7 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 import streamlit as st
 import time
-import pandas as pd
+import sqlglot
 from src.core.engine import TennisGuruEngine
 
 # Page config
@@ -30,7 +30,28 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-engine = TennisGuruEngine()
+# Results up to this size are rendered from plain records
+SMALL_RESULT_ROWS = 200
+
+
+def unique_headers(names):
+    """Suffix repeated headers (e.g. two 'First Name' columns) so no column is dropped."""
+    seen = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return unique
+
+
+@st.cache_resource
+def get_engine() -> TennisGuruEngine:
+    # Built once per server process; Streamlit re-runs this script on every
+    # interaction.
+    return TennisGuruEngine()
+
+
+engine = get_engine()
 
 st.title("🎾 Tennis Guru")
 st.caption("Deterministic Natural Language → SQL Engine (v1.0)")
@@ -51,43 +72,60 @@ if st.button("Run Query") and question:
     st.subheader("Results")
 
     if result.results:
-        # Convert results to DataFrame
-        df = pd.DataFrame(result.results)
+        width = len(result.results[0])
 
-        # Try to derive column names from SQL aliases (SELECT ... AS alias)
+        # Derive column names from the SELECT projections (alias, else column name)
         column_names = []
-        if result.sql and "select" in result.sql.lower():
+        if result.sql:
             try:
-                select_part = result.sql.lower().split("from")[0]
-                select_part = select_part.replace("select", "").strip()
-                raw_cols = select_part.split(",")
-
-                for col in raw_cols:
-                    col = col.strip()
-                    if " as " in col:
-                        alias = col.split(" as ")[-1].strip()
-                        column_names.append(alias.replace("_", " ").title())
-                    else:
-                        # fallback: use last token after dot
-                        base = col.split(".")[-1]
-                        column_names.append(base.replace("_", " ").title())
-            except Exception:
+                projections = sqlglot.parse_one(result.sql, read="sqlite").selects
+                column_names = [
+                    (e.output_name or e.sql(dialect="sqlite")).replace("_", " ").title()
+                    for e in projections
+                ]
+            except sqlglot.errors.SqlglotError:
                 column_names = []
 
-        # Apply derived names if they match the dataframe width
-        if column_names and len(column_names) == df.shape[1]:
-            df.columns = column_names
-        else:
+        # Apply derived names only if they match the result width
+        if not column_names or len(column_names) != width:
             # Fallback generic headers
-            df.columns = [f"Column {i+1}" for i in range(df.shape[1])]
+            column_names = [f"Column {i+1}" for i in range(width)]
 
-        st.dataframe(df, use_container_width=True, hide_index=True)
+        column_names = unique_headers(column_names)
+
+        # Small results go straight to Streamlit as records; larger ones are
+        # transposed once into Arrow columns, which Streamlit serializes
+        # natively (no per-row dicts, no pandas hop). pyarrow is optional:
+        # without it every result takes the records path.
+        data = None
+        if len(result.results) > SMALL_RESULT_ROWS:
+            try:
+                import pyarrow as pa
+            except ImportError:
+                pa = None
+            if pa is not None:
+                try:
+                    data = pa.Table.from_arrays(
+                        [pa.array(col) for col in zip(*result.results)],
+                        names=column_names,
+                    )
+                except pa.ArrowException:
+                    # SQLite allows mixed types per column; Arrow does not
+                    data = None
+        if data is None:
+            data = [dict(zip(column_names, row)) for row in result.results]
+
+        st.dataframe(data, use_container_width=True, hide_index=True)
+        if result.truncated:
+            st.caption(f"Showing the first {len(result.results)} rows.")
     else:
         st.info("No results returned.")
 
     # Then display SQL in an expander
     with st.expander("SQL (click to view)", expanded=False):
         st.code(result.sql, language="sql")
+        if result.params:
+            st.caption(f"Parameters: {list(result.params)}")
 
     # Metadata
     st.markdown("---")
@@ -8,41 +8,97 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from src.core.engine import TennisGuruEngine, format_for_cli
+EXIT_WORDS = {"exit", "quit", "q"}
 
-def main():
-    engine = TennisGuruEngine()
-
-    while True:
-        q = input("Ask Tennis Guru (or type 'exit'): ").strip()
-        if not q:
-            continue
-        if q.lower() in {"exit", "quit", "q"}:
-            print("Bye! 🎾")
-            break
+# Questions answered concurrently when stdin is a file/pipe
+BATCH_WORKERS = 8
 
-        res = engine.process(q)
 
-        # Handle engine-level errors
-        if getattr(res, "error", None):
-            print("\n❌ Error:\n")
-            print(res.error)
-            continue
+def print_result(res, format_for_cli):
+    """Writes the whole answer block to stdout in a single call."""
+    parts = []
 
+    # Handle engine-level errors
+    if getattr(res, "error", None):
+        parts.append(f"\n❌ Error:\n\n{res.error}\n")
+    else:
         if res.cached:
-            print("\n⚡ Cached result used.")
+            parts.append("\n⚡ Cached result used.\n")
 
         if res.explanation:
-            print("\n--- Explanation ---\n")
-            print(res.explanation)
+            parts.append(f"\n--- Explanation ---\n\n{res.explanation}\n")
 
-        print("\n--- Results ---\n")
+        parts.append("\n--- Results ---\n\n")
 
         # Optional total execution time display
         if getattr(res, "total_time", None) is not None:
-            print(f"\n⏱ Total time: {res.total_time:.3f}s")
+            parts.append(f"\n⏱ Total time: {res.total_time:.3f}s\n")
+
+        parts.append(f"{format_for_cli(res)}\n")
+
+        if getattr(res, "truncated", False):
+            parts.append("\n(Result truncated: only the first rows were kept.)\n")
+
+    sys.stdout.write("".join(parts))
+    sys.stdout.flush()
+
+
+def run_batch(lines):
+    """
+    Scripted input (python cli/nl_query.py < questions.txt): every question
+    is read up front and processed concurrently, so LLM round trips overlap.
+    Output keeps the input order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from src.core.engine import TennisGuruEngine, format_for_cli
+
+    questions = []
+    for line in lines:
+        q = line.strip()
+        if not q:
+            continue
+        if q.lower() in EXIT_WORDS:
+            break
+        questions.append(q)
+
+    if not questions:
+        return
+
+    engine = TennisGuruEngine()
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        for q, res in zip(questions, pool.map(engine.process, questions)):
+            sys.stdout.write(f"\n>>> {q}\n")
+            print_result(res, format_for_cli)
+
+
+def main():
+    # --debug shows the final SQL of every question (engine debug log)
+    if "--debug" in sys.argv[1:]:
+        import logging
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("src.core").setLevel(logging.DEBUG)
+
+    if not sys.stdin.isatty():
+        run_batch(sys.stdin)
+        return
+
+    # The engine (SQLite, OpenAI client) is loaded on the first real
+    # question, so the prompt appears immediately.
+    engine = None
+
+    while True:
+        q = input("Ask Tennis Guru (or type 'exit'): ").strip()
+        if not q:
+            continue
+        if q.lower() in EXIT_WORDS:
+            print("Bye! 🎾")
+            break
+
+        if engine is None:
+            from src.core.engine import TennisGuruEngine, format_for_cli
+            engine = TennisGuruEngine()
 
-        print(format_for_cli(res))
+        print_result(engine.process(q), format_for_cli)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,2 +1,289 @@
-# In-memory cache (same-process)
-QUERY_CACHE: dict[str, dict] = {}
\ No newline at end of file
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+from .schema import DB_PATH, SCHEMA_DESCRIPTION
+
+# orjson is optional: same JSON on disk, several times faster to encode and
+# decode. Both loaders accept str and bytes, so rows written by either
+# backend stay readable.
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+CACHE_DB_PATH = DB_PATH.with_name("query_cache.db")
+
+# Upper bound for each in-memory tier; least recently used entries go first.
+MAX_MEMORY_ENTRIES = 1024
+
+# Entries written under a different schema description are treated as misses.
+SCHEMA_VERSION = hashlib.sha1(SCHEMA_DESCRIPTION.encode("utf-8")).hexdigest()[:16]
+
+_WORD_RE = re.compile(r"\w+")
+
+# Words dropped from the canonical key. Kept deliberately small: anything
+# that can change the SQL (how many / which / before / never ...) stays.
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "please",
+    "el", "la", "los", "las", "un", "una",
+})
+
+
+def canonical_key(question: str) -> str:
+    """
+    Canonical form of a question: lowercased, accents and punctuation
+    removed, filler words dropped. Word order is preserved so that
+    "A beat B" and "B beat A" never share a key.
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(w for w in _WORD_RE.findall(text) if w not in _FILLER_WORDS)
+
+
+class QueryCache:
+    """
+    In-memory question cache (same-process).
+    See PersistentQueryCache for the disk-backed variant used by the engine.
+
+    Lookup waterfall:
+    1) exact normalized question (strip + lower)
+    2) canonical key, so "How many titles did Federer win?" and
+       "how many titles did federer win" share one entry
+
+    Both tiers are LRU-bounded to max_entries.
+    """
+
+    def __init__(self, max_entries: int = MAX_MEMORY_ENTRIES):
+        self._max_entries = max_entries
+        # get() reorders the LRU, so concurrent readers need the lock too
+        self._mem_lock = threading.RLock()
+        self._exact: OrderedDict[str, dict] = OrderedDict()
+        self._canonical: OrderedDict[str, dict] = OrderedDict()
+
+    def _remember(self, tier: OrderedDict, key: str, entry: dict) -> None:
+        tier[key] = entry
+        tier.move_to_end(key)
+        if len(tier) > self._max_entries:
+            tier.popitem(last=False)
+
+    def get(self, question: str) -> dict | None:
+        q_norm = question.strip().lower()
+        with self._mem_lock:
+            entry = self._exact.get(q_norm)
+            if entry is not None:
+                self._exact.move_to_end(q_norm)
+                return entry
+
+        key = canonical_key(question)
+        with self._mem_lock:
+            entry = self._canonical.get(key)
+            if entry is not None:
+                self._canonical.move_to_end(key)
+                self._remember(self._exact, q_norm, entry)
+        return entry
+
+    def put(self, question: str, entry: dict) -> None:
+        q_norm = question.strip().lower()
+        key = canonical_key(question)
+        with self._mem_lock:
+            self._remember(self._exact, q_norm, entry)
+            self._remember(self._canonical, key, entry)
+
+    def clear(self) -> None:
+        with self._mem_lock:
+            self._exact.clear()
+            self._canonical.clear()
+
+
+def data_version(db_path: Path = DB_PATH) -> float:
+    """
+    Modification time of the tennis DB file. Changes once ingest or a
+    rebuild commits and checkpoints into it. The -wal file is ignored on
+    purpose: read-only connections recreate it without changing any data.
+    """
+    try:
+        return os.path.getmtime(db_path)
+    except OSError:
+        return 0.0
+
+
+class PersistentQueryCache(QueryCache):
+    """
+    QueryCache backed by a small SQLite file, so entries survive
+    Streamlit reruns and are shared between worker processes.
+
+    The in-memory tiers stay in front; the disk table is keyed by the
+    canonical question and only consulted on a memory miss. Any SQLite
+    error degrades to the in-memory behaviour.
+
+    Entries are stamped with data_version() of the source DB: once the
+    tennis data is rebuilt, older rows are misses and the memory tiers
+    are flushed.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = CACHE_DB_PATH,
+        max_entries: int = MAX_MEMORY_ENTRIES,
+        source_db: Path = DB_PATH,
+    ):
+        super().__init__(max_entries)
+        self._db_path = db_path
+        self._source_db = source_db
+        self._data_version = data_version(source_db)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _check_data_version(self) -> float:
+        version = data_version(self._source_db)
+        if version != self._data_version:
+            self._data_version = version
+            super().clear()
+        return version
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(query_cache)")}
+            if columns and not {"db_mtime", "truncated"} <= columns:
+                # Cache file from an older layout: it is only a cache
+                conn.execute("DROP TABLE query_cache")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    sql TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    truncated INTEGER NOT NULL,
+                    schema_version TEXT NOT NULL,
+                    db_mtime REAL NOT NULL,
+                    ts REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def get(self, question: str) -> dict | None:
+        version = self._check_data_version()
+        entry = super().get(question)
+        if entry is not None:
+            return entry
+
+        key = canonical_key(question)
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT sql, params, results, truncated FROM query_cache "
+                    "WHERE cache_key = ? AND schema_version = ? AND db_mtime = ?",
+                    (key, SCHEMA_VERSION, version),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+
+        sql, params, results, truncated = row
+        entry = {
+            "sql": sql,
+            "params": tuple(_loads(params)),
+            "results": [tuple(r) for r in _loads(results)],
+            "truncated": bool(truncated),
+        }
+        super().put(question, entry)
+        return entry
+
+    def put(self, question: str, entry: dict) -> None:
+        version = self._check_data_version()
+        super().put(question, entry)
+        try:
+            payload = (
+                canonical_key(question),
+                entry["sql"],
+                _dumps(list(entry["params"])),
+                _dumps(entry["results"]),
+                int(entry.get("truncated", False)),
+                SCHEMA_VERSION,
+                version,
+                time.time(),
+            )
+        except (TypeError, ValueError):
+            # Non-JSON values (e.g. BLOB columns) stay memory-only.
+            return
+        try:
+            with self._lock:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    payload,
+                )
+        except sqlite3.Error:
+            pass
+
+
+class ResultCache:
+    """
+    Rows of recently executed statements, keyed by (sql, params).
+
+    Catches different questions that end up on the same statement (a
+    template reached through another phrasing, identical LLM output), which
+    the question cache cannot see. Only statements that executed
+    successfully are stored; large results are skipped. Flushed whenever
+    the tennis DB changes (data_version).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_rows: int = 1000,
+        source_db: Path = DB_PATH,
+    ):
+        self._max_entries = max_entries
+        self._max_rows = max_rows
+        self._source_db = source_db
+        self._data_version = data_version(source_db)
+        self._entries: OrderedDict[tuple[str, tuple], list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_data_version(self) -> None:
+        version = data_version(self._source_db)
+        if version != self._data_version:
+            self._data_version = version
+            self._entries.clear()
+
+    def get(self, sql: str, params: tuple) -> list | None:
+        key = (sql, tuple(params))
+        with self._lock:
+            self._check_data_version()
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+            return rows
+
+    def put(self, sql: str, params: tuple, rows: list) -> None:
+        if len(rows) > self._max_rows:
+            return
+        key = (sql, tuple(params))
+        with self._lock:
+            self._check_data_version()
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+QUERY_CACHE = PersistentQueryCache()
+RESULT_CACHE = ResultCache()
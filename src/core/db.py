@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+from .schema import DB_PATH
+from .sql_executor import open_connection
+
+# One connection per (thread, database). sqlite3 connections are cheap to
+# share within a thread and keep their own prepared-statement cache, so
+# short lookups (e.g. player-name checks in the router) stop paying for
+# open/close and pragma setup on every question.
+_local = threading.local()
+
+# Databases copied into in-memory SQLite databases: file path -> URI.
+# memdb names starting with "/" are shared by every connection in the
+# process, each with its own regular locking (no shared-cache table locks,
+# so readers run in parallel). The holder connections keep each copy
+# alive (it is dropped when its last connection closes).
+_MEMORY_URIS: dict[Path, str] = {}
+_memory_holders: list[sqlite3.Connection] = []
+
+
+def get_conn(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = open_connection(db_path, uri=_MEMORY_URIS.get(db_path))
+    return conn
+
+
+def load_into_memory(db_path: Path = DB_PATH) -> None:
+    """
+    Copies db_path (tables and indexes) into an in-memory database;
+    get_conn connections opened afterwards read from RAM instead of the
+    file. Meant for read-only runs such as the benchmark. Connections a
+    thread already holds keep using the file.
+    """
+    if db_path in _MEMORY_URIS:
+        return
+
+    uri = f"file:/guru_memory_{len(_memory_holders)}?vfs=memdb"
+    holder = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    # mode=ro: a missing file raises instead of being created empty
+    source = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        # Not Connection.backup(): it copies the WAL flag from the file
+        # header, which memdb cannot open. VACUUM INTO writes a
+        # rollback-journal copy.
+        source.execute("VACUUM INTO ?", (uri,))
+    finally:
+        source.close()
+
+    _memory_holders.append(holder)
+    _MEMORY_URIS[db_path] = uri
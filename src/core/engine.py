@@ -1,27 +1,46 @@
+import io
+import logging
+import os
+import threading
 from dataclasses import dataclass
 from typing import Optional, List, Tuple, Any
 
-from .cache import QUERY_CACHE
+from .cache import QUERY_CACHE, RESULT_CACHE
 from .router import (
     classify_intent,
     is_question_ambiguous,
     build_same_tournament_multi_defeat_query,
     build_final_ranking_query,
+    build_grand_slam_titles_query,
+    build_top_ranked_players_query,
 )
 from .semantic_guard import SemanticGuard
-from .llm_generator import generate_sql_from_question, generate_nl_answer
-from .sql_executor import execute_sql
+from .llm_generator import generate_sql_from_question, generate_nl_answer, create_client, warm_up
+from .sql_executor import execute_sql, QueryTimeoutError
 from .sql_transformer import SQLTransformer
 
 
 
-@dataclass
+log = logging.getLogger(__name__)
+
+# Set (to any non-empty value) to run every engine without the question
+# and result caches, e.g. to time the pipeline itself.
+NO_QUERY_CACHE_ENV = "TENNIS_GURU_NO_QUERY_CACHE"
+
+# Rows kept per answer (results, cache). One extra row is read to tell
+# whether the query had more.
+MAX_ROWS = 1000
+
+
+@dataclass(slots=True)
 class EngineResult:
     question: str
     # Final SQL actually executed (after semantic + structural transforms)
     sql: Optional[str] = None
     # Raw SQL returned by the LLM before transformations
     generated_sql: Optional[str] = None
+    # Bound parameters for `sql` (deterministic templates use ? placeholders)
+    params: Tuple[Any, ...] = ()
     # Query results
     results: Optional[List[Tuple[Any, ...]]] = None
     # Human-readable explanation of how SQL was produced
@@ -34,6 +53,10 @@ class EngineResult:
     cached: bool = False
     needs_clarification: bool = False
     error: Optional[str] = None
+    # True when the query returned more than MAX_ROWS rows
+    truncated: bool = False
+    # True when execution was stopped by the SQL timeout
+    timed_out: bool = False
 
 
 class TennisGuruEngine:
@@ -49,27 +72,70 @@ class TennisGuruEngine:
     - context update
     """
 
-    def process(self, question: str) -> EngineResult:
-        q_norm = question.strip().lower()
+    def __init__(self, use_query_cache: bool | None = None):
+        # use_query_cache=False skips the question cache (QUERY_CACHE,
+        # persisted on disk) and the statement RESULT_CACHE: every question
+        # goes through routing / LLM and SQLite. Defaults to on unless
+        # NO_QUERY_CACHE_ENV is set.
+        if use_query_cache is None:
+            use_query_cache = not os.getenv(NO_QUERY_CACHE_ENV)
+        self._use_query_cache = use_query_cache
 
+        # SQL runs on the calling thread's read-only connection (db.get_conn),
+        # reused across questions. Concurrent process() calls (Streamlit,
+        # benchmark workers) each read through their own connection to the
+        # same file instead of queueing on one. Engine indexes are built by
+        # the setup step (sql_executor.ensure_indexes), not here.
+
+        # LLM client held for the engine's lifetime (pooled keep-alive
+        # connections). It is imported, built and warmed up in the
+        # background, so startup and cache/template answers never wait on it.
+        self._client = None
+        self._client_ready = threading.Event()
+        threading.Thread(target=self._start_llm_client, daemon=True).start()
+
+    def _start_llm_client(self) -> None:
+        try:
+            self._client = create_client()
+        except Exception:
+            # e.g. missing API key: llm_client() retries and raises in process()
+            pass
+        finally:
+            self._client_ready.set()
+        if self._client is not None:
+            warm_up(self._client)
+
+    def llm_client(self):
+        """The engine's OpenAI client; waits for the background startup."""
+        self._client_ready.wait()
+        if self._client is None:
+            self._client = create_client()
+        return self._client
+
+    def process(self, question: str) -> EngineResult:
         # =============================
         # 1) Cache
         # =============================
-        if q_norm in QUERY_CACHE:
-            cached = QUERY_CACHE[q_norm]
+        cached = QUERY_CACHE.get(question) if self._use_query_cache else None
+        if cached is not None:
             return EngineResult(
                 question=question,
                 sql=cached["sql"],
+                params=cached["params"],
                 results=cached["results"],
+                truncated=cached.get("truncated", False),
                 explanation="Cached result.",
                 llm_generation_time=None,
                 cached=True,
             )
 
+        # Normalized once; the router and guard all work on this copy.
+        q_lower = question.strip().lower()
+
         # =============================
         # 2) Ambiguity detection
         # =============================
-        if is_question_ambiguous(question):
+        if is_question_ambiguous(q_lower):
             return EngineResult(
                 question=question,
                 sql=None,
@@ -83,25 +149,38 @@ class TennisGuruEngine:
         # =============================
         # 3) Deterministic routing
         # =============================
-        intent = classify_intent(question)
+        intent = classify_intent(question, q_lower)
         sql = None
+        params = ()
         explanation = None
         llm_time = None
+        routed = None
 
         if intent == "same_tournament_multi_defeat":
-            sql = build_same_tournament_multi_defeat_query(question)
+            routed = build_same_tournament_multi_defeat_query(question, q_lower)
             explanation = "Deterministic template: same-tournament multi-opponent defeat."
 
         elif intent == "ranking_at_final":
-            sql = build_final_ranking_query(question)
+            routed = build_final_ranking_query(question, q_lower)
             explanation = "Deterministic template: ranking at specific final."
 
+        elif intent == "grand_slam_titles":
+            routed = build_grand_slam_titles_query(question, q_lower)
+            explanation = "Deterministic template: Grand Slam titles."
+
+        elif intent == "top_ranked_players":
+            routed = build_top_ranked_players_query(question, q_lower)
+            explanation = "Deterministic template: current top-N ranking."
+
+        if routed:
+            sql, params = routed
+
         # =============================
         # 4) LLM fallback
         # =============================
         if not sql:
             try:
-                sql, explanation, llm_time = generate_sql_from_question(question)
+                sql, explanation, llm_time = generate_sql_from_question(question, client=self.llm_client())
             except Exception as e:
                 return EngineResult(
                     question=question,
@@ -117,7 +196,7 @@ class TennisGuruEngine:
         # =============================
         generated_sql = sql
         try:
-            sql = SemanticGuard.validate_and_autofix(question, sql)
+            sql = SemanticGuard.validate_and_autofix(q_lower, sql)
             # Structural transformation layer (policy enforcement)
             sql = SQLTransformer.rewrite_structural(sql)
         except Exception as e:
@@ -125,6 +204,7 @@ class TennisGuruEngine:
                 question=question,
                 sql=sql,
                 generated_sql=generated_sql,
+                params=params,
                 results=None,
                 explanation=explanation,
                 llm_generation_time=llm_time,
@@ -134,38 +214,53 @@ class TennisGuruEngine:
         # =============================
         # 6) Execute SQL
         # =============================
-        # Debug: print final SQL before execution
-        print("\n--- FINAL SQL ---\n")
-        print(sql)
+        log.debug("FINAL SQL:\n%s", sql)
+        # Same statement already answered (validated and executed) earlier
+        results = RESULT_CACHE.get(sql, params) if self._use_query_cache else None
         try:
-            results = execute_sql(sql, timeout_seconds=30)
+            if results is None:
+                results = execute_sql(
+                    sql, params, timeout_seconds=30, max_rows=MAX_ROWS + 1,
+                )
+                if self._use_query_cache:
+                    RESULT_CACHE.put(sql, params, results)
+            truncated = len(results) > MAX_ROWS
+            if truncated:
+                results = results[:MAX_ROWS]
         except Exception as e:
             return EngineResult(
                 question=question,
                 sql=sql,
                 generated_sql=generated_sql,
+                params=params,
                 results=None,
                 explanation=explanation,
                 llm_generation_time=llm_time,
                 error=str(e),
+                timed_out=isinstance(e, QueryTimeoutError),
             )
 
         # =============================
         # 7) Update context + cache
         # =============================
 
-        QUERY_CACHE[q_norm] = {
-            "sql": sql,
-            "results": results,
-        }
+        if self._use_query_cache:
+            QUERY_CACHE.put(question, {
+                "sql": sql,
+                "params": params,
+                "results": results,
+                "truncated": truncated,
+            })
 
         return EngineResult(
             question=question,
             sql=sql,
             generated_sql=generated_sql,
+            params=params,
             results=results,
             explanation=explanation,
             llm_generation_time=llm_time,
+            truncated=truncated,
         )
 
 
@@ -194,6 +289,11 @@ def format_for_cli(res: EngineResult) -> str:
     if len(res.results[0]) == 2 and all(isinstance(c, str) for c in res.results[0]):
         return ", ".join(f"{a} {b}" for a, b in res.results)
 
-    # Generic table output
-    lines = [" | ".join(str(c) for c in row) for row in res.results[:100]]
-    return "\n".join(lines)
+    # Generic table output (first 100 rows), written into one buffer
+    buf = io.StringIO()
+    write = buf.write
+    for i, row in enumerate(res.results[:100]):
+        if i:
+            write("\n")
+        write(" | ".join(map(str, row)))
+    return buf.getvalue()
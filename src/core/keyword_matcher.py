@@ -0,0 +1,41 @@
+import re
+from typing import Iterable, Mapping
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher.
+
+    All keywords from all buckets are compiled into a single regex
+    alternation, so one scan over the text reports every bucket that
+    has at least one keyword present (same semantics as `k in text`).
+
+    Keywords are matched verbatim (no word boundaries); callers pass
+    already-lowercased text and lowercase keywords.
+    """
+
+    def __init__(self, buckets: Mapping[str, Iterable[str]]):
+        owners: dict[str, set[str]] = {}
+        for bucket, keywords in buckets.items():
+            for kw in keywords:
+                owners.setdefault(kw, set()).add(bucket)
+
+        # Longest keywords first: at any position the alternation returns
+        # the longest keyword that matches there. Every shorter keyword
+        # matching at that same position is a prefix of it, so its buckets
+        # are folded in here and no hit is lost.
+        ordered = sorted(owners, key=len, reverse=True)
+        self._buckets = {
+            kw: frozenset().union(*(owners[k] for k in owners if kw.startswith(k)))
+            for kw in ordered
+        }
+
+        # Zero-width lookahead lets matches overlap (one attempt per position).
+        alternation = "|".join(re.escape(kw) for kw in ordered)
+        self._pattern = re.compile(f"(?=({alternation}))")
+
+    def scan(self, text: str) -> frozenset[str]:
+        hits: set[str] = set()
+        for match in self._pattern.finditer(text):
+            hits |= self._buckets[match.group(1)]
+        return frozenset(hits)
@@ -1,11 +1,22 @@
+from __future__ import annotations
+
+import hashlib
+import logging
 import os
-from dotenv import load_dotenv
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Tuple
+import time
 
-load_dotenv()
+log = logging.getLogger(__name__)
 
-from typing import Tuple
-from openai import OpenAI
-import time
+# openai / httpx / dotenv are imported on first client creation, so
+# processes that only hit the cache or the deterministic templates never
+# pay for them.
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # ==========================================================
 # LLM GENERATOR
@@ -22,9 +33,56 @@ import time
 # The model must generate correct SQL directly.
 # ==========================================================
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Keep-alive pool for the OpenAI client. Idle connections survive for
+# keepalive_expiry seconds, so questions asked a few minutes apart reuse
+# the same TLS session instead of handshaking again.
+HTTP_LIMITS = dict(
+    max_connections=8,
+    max_keepalive_connections=4,
+    keepalive_expiry=300,
+)
+
+
+def create_client() -> OpenAI:
+    """
+    Builds an OpenAI client with a pooled HTTP transport.
+    TennisGuruEngine owns one and passes it to every call.
+    """
+    import httpx
+    from openai import OpenAI
+
+    # .env is only read (and python-dotenv only imported) when the key
+    # is not already in the environment.
+    if not os.getenv("OPENAI_API_KEY"):
+        from dotenv import load_dotenv
+        load_dotenv()
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.Client(limits=httpx.Limits(**HTTP_LIMITS)),
+    )
+
+
+@lru_cache(maxsize=1)
+def default_client() -> OpenAI:
+    """Shared client for callers that do not hold their own."""
+    return create_client()
 
 
+def warm_up(client: OpenAI) -> None:
+    """
+    Opens the connection ahead of the first question (DNS + TLS).
+    Best-effort: failures surface on the real call instead.
+    """
+    try:
+        client.models.list()
+    except Exception:
+        pass
+
+
+# Sent verbatim as the first message of every request: keep it a constant
+# (no f-string / per-question content) so OpenAI's automatic prompt caching
+# keeps matching the prefix. Everything question-specific goes in the
+# user message.
 SYSTEM_PROMPT = """
 You are an expert SQL generator for a tennis analytics database.
 You MUST strictly follow all rules below.
@@ -383,28 +441,162 @@ Do NOT modify any other part of the file.
 # ==========================================================
 
 
-def generate_sql_from_question(question: str) -> Tuple[str, str, float]:
+LLM_MODEL = "gpt-4.1-mini"
+
+# Completion budget for one SQL statement; the longest prompt examples are
+# well under this, and the stream is cut at the first ';' anyway.
+LLM_MAX_TOKENS = 1024
+
+# Question -> SQL answers already produced by the model (temperature 0, so a
+# repeat would return the same SQL). Keyed by SHA-256 over model, system
+# prompt and normalized question, so a prompt or model change never serves
+# stale SQL. Survives question-cache invalidation (DB rebuilds).
+LLM_SQL_CACHE_SIZE = 512
+_LLM_SQL_CACHE: OrderedDict[str, str] = OrderedDict()
+_LLM_SQL_CACHE_LOCK = threading.Lock()
+_PROMPT_HASH = hashlib.sha256(f"{LLM_MODEL}\0{SYSTEM_PROMPT}\0".encode())
+
+
+def _llm_cache_key(question: str) -> str:
+    h = _PROMPT_HASH.copy()
+    h.update(question.strip().lower().encode())
+    return h.hexdigest()
+
+
+def _log_usage(usage) -> None:
+    """Debug log of prompt-cache hits (cached_tokens > 0 means the prefix matched)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    log.debug(
+        "LLM usage: prompt_tokens=%s cached_tokens=%s completion_tokens=%s",
+        usage.prompt_tokens,
+        getattr(details, "cached_tokens", None),
+        usage.completion_tokens,
+    )
+
+
+def _statement_end(text: str) -> int:
+    """
+    Index just past the first ';' outside a string literal, or -1.
+    """
+    quote = None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == ";":
+            return i + 1
+    return -1
+
+
+def _strip_fences(sql: str) -> str:
+    """
+    Removes a ```sql ... ``` wrapper if the model adds one despite the
+    prompt. Plain string checks: the common unfenced case costs one
+    startswith().
+    """
+    if not sql.startswith("```"):
+        return sql
+    sql = sql[3:]
+    if sql[:3].lower() == "sql":
+        sql = sql[3:]
+    return sql.removesuffix("```").strip()
+
+
+def _select_prefix(text: str) -> bool | None:
+    """
+    Whether streamed output starts with SELECT (after any fence),
+    or None while too few characters have arrived to tell.
+    """
+    head = text.lstrip().lstrip("`")
+    if head[:3].lower() == "sql":
+        head = head[3:]
+    head = head.lstrip()
+    if len(head) < 6:
+        return None
+    return head[:6].lower() == "select"
+
+
+def generate_sql_from_question(
+    question: str,
+    client: OpenAI | None = None,
+    use_cache: bool = True,
+) -> Tuple[str, str, float]:
     """
     Returns (sql, explanation, llm_generation_time)
-    Explanation kept minimal for logging.
+    Explanation kept minimal for logging. use_cache=False always calls
+    the model and leaves the in-process SQL cache untouched (warm-ups).
+
+    The completion is streamed and cut at the end of the first
+    statement, so execution never waits on trailing tokens. Output that
+    does not start with SELECT is cut as soon as that is known; it would
+    fail validate_sql anyway.
     """
 
+    key = _llm_cache_key(question)
+    sql = None
+    if use_cache:
+        with _LLM_SQL_CACHE_LOCK:
+            sql = _LLM_SQL_CACHE.get(key)
+            if sql is not None:
+                _LLM_SQL_CACHE.move_to_end(key)
+    if sql is not None:
+        return sql, "SQL generated from natural language question (reused).", 0.0
+
+    if client is None:
+        client = default_client()
+
     start_time = time.perf_counter()
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
+    stream = client.chat.completions.create(
+        model=LLM_MODEL,
         temperature=0,
+        max_tokens=LLM_MAX_TOKENS,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": question},
         ],
+        stream=True,
+        stream_options={"include_usage": True},
     )
 
+    parts = []
+    is_select = None
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                _log_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            if is_select is None:
+                is_select = _select_prefix("".join(parts))
+                if is_select is False:
+                    break
+            if ";" in delta:
+                text = "".join(parts)
+                end = _statement_end(text)
+                if end != -1:
+                    parts = [text[:end]]
+                    break
+    finally:
+        stream.close()
+
     end_time = time.perf_counter()
 
     llm_generation_time = round(end_time - start_time, 4)
 
-    sql = response.choices[0].message.content.strip()
+    sql = _strip_fences("".join(parts).strip())
+
+    if use_cache and sql and is_select:
+        with _LLM_SQL_CACHE_LOCK:
+            _LLM_SQL_CACHE[key] = sql
+            if len(_LLM_SQL_CACHE) > LLM_SQL_CACHE_SIZE:
+                _LLM_SQL_CACHE.popitem(last=False)
 
     return sql, "SQL generated from natural language question.", llm_generation_time
 
@@ -414,15 +606,43 @@ def generate_sql_from_question(question: str) -> Tuple[str, str, float]:
 # ==========================================================
 
 
+# (question words, unit): the first of these words after "how many" /
+# "cuántos" names what is counted. Questions without a count phrase
+# (years, ages, percentages) get the bare value.
+_NL_UNITS = (
+    (frozenset({"aces"}), "aces"),
+    (frozenset({"match", "matches", "partido", "partidos"}), "partidos"),
+    (frozenset({"week", "weeks", "semanas"}), "semanas"),
+    (frozenset({"title", "titles", "titulos", "títulos", "torneos"}), "títulos"),
+    (frozenset({"semifinal", "semifinals", "semifinales", "semis"}), "semifinales"),
+    (frozenset({"final", "finals", "finales"}), "finales"),
+    (frozenset({"slam", "slams"}), "torneos de Grand Slam"),
+    (frozenset({"win", "wins", "victorias"}), "victorias"),
+)
+_NL_UNIT_BY_WORD = {word: unit for keywords, unit in _NL_UNITS for word in keywords}
+_NL_WORD_RE = re.compile(r"\w+")
+# "how many X", "cuántos X": the counted noun is among the next few words
+_NL_COUNT_RE = re.compile(r"\b(?:how many|cu[aá]nt[oa]s)\s+((?:\w+\s+){0,3}\w+)")
+
+
+def _nl_unit(q: str) -> str | None:
+    count = _NL_COUNT_RE.search(q)
+    if count is None:
+        return None
+    for word in _NL_WORD_RE.findall(count.group(1)):
+        if word in _NL_UNIT_BY_WORD:
+            return _NL_UNIT_BY_WORD[word]
+    return None
+
+
 def generate_nl_answer(question: str, value: int) -> str:
     """
     Simple deterministic natural-language wrapper
     for numeric answers.
     """
 
-    q = question.lower()
-
-    if "grand slam" in q and "federer" in q:
-        return f"Roger Federer ganó {value} torneos de Grand Slam."
+    unit = _nl_unit(question.lower())
+    if unit:
+        return f"Resultado: {value} {unit}."
 
     return str(value)
@@ -1,138 +1,249 @@
 import re
-import sqlite3
+from functools import lru_cache
 from .schema import DB_PATH
+from .db import get_conn
+from .keyword_matcher import KeywordMatcher
 
-AMBIGUOUS_KEYWORDS = {
+# Compiled once at import; every question goes through these.
+_NAME_RE = re.compile(r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\b")
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+_TOURNEY_RE = re.compile(r"(Wimbledon|Roland Garros|US Open|Australian Open)", re.IGNORECASE)
+_WORD_RE = re.compile(r"\w+")
+_CAPITALIZED_RE = re.compile(r"\b[A-ZÁÉÍÓÚÑ][\w'-]*")
+
+AMBIGUOUS_KEYWORDS = frozenset({
     "best player","most impressive","strongest era","most dominant","greatest",
     "strongest generation","best era","biggest upset","most impressive career",
     "who was better","who was more dominant",
-}
+})
 
-RECORD_KEYWORDS = {
+RECORD_KEYWORDS = frozenset({
     "record","récord","most wins","most matches","most victories","all time leader",
     "all-time leader","record of most","record de mas","record de más",
     "mas partidos ganados","más partidos ganados",
-}
+})
 
-SCOPE_KEYWORDS = {
+SCOPE_KEYWORDS = frozenset({
     "grand slam","masters","masters 1000","atp","wta","challenger","futures",
     "roland garros","wimbledon","us open","australian open",
+})
+
+DEFEAT_PHRASES = frozenset({"le gano a","le ganó a","derroto a","derrotó a"})
+DEFEAT_WORDS = frozenset({"beat","beats","beaten","defeated"})
+FINAL_WORDS = frozenset({"final","finals"})
+SAME_TOURNAMENT_PHRASES = frozenset({"mismo torneo","same tournament"})
+GRAND_SLAM_PHRASES = frozenset({"grand slam","grand-slam"})
+TITLE_WORDS = frozenset({
+    "won","win","wins","title","titles","gano","ganó","gana","titulos","títulos",
+})
+# "Grand Slam match wins" counts matches, not titles: left to the LLM.
+NOT_TITLE_WORDS = frozenset({"match","matches","partido","partidos"})
+# Spelled-out counts accepted by the top-N template: one to twenty and
+# the tens up to a hundred. Anything else needs digits.
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+    "eighty": 80, "ninety": 90, "hundred": 100,
 }
+# Whole-question match: "top 10 players", "who are the top ten WTA players?"
+# Only digits or NUMBER_WORDS, so classify_intent never routes a question
+# the template cannot build.
+_TOP_PLAYERS_RE = re.compile(
+    r"^(?:who are |list |show |show me )?(?:the )?top "
+    rf"([1-9]\d{{0,2}}|{'|'.join(NUMBER_WORDS)}) "
+    r"(?:(atp|wta) )?players\??$"
+)
+MAJOR_TOURNAMENTS = frozenset({"wimbledon","roland garros","us open","australian open"})
+FOLLOWUP_TOURNEY_PATTERNS = (
+    "en que torneo",
+    "en qué torneo",
+    "which tournament",
+    "what tournament",
+)
 
-def is_question_ambiguous(question: str) -> bool:
-    q = question.strip().lower()
-    if any(k in q for k in AMBIGUOUS_KEYWORDS):
+# Every phrase family the router knows, compiled into one pattern: a single
+# scan over the lowercased question reports all families present.
+_QUESTION_MATCHER = KeywordMatcher({
+    "ambiguous": AMBIGUOUS_KEYWORDS,
+    "record": RECORD_KEYWORDS,
+    "scope": SCOPE_KEYWORDS,
+    "defeat": DEFEAT_PHRASES,
+    "same_tournament": SAME_TOURNAMENT_PHRASES,
+    "grand_slam": GRAND_SLAM_PHRASES,
+    "major": MAJOR_TOURNAMENTS,
+    "followup_tourney": FOLLOWUP_TOURNEY_PATTERNS,
+})
+
+@lru_cache(maxsize=1024)
+def _scan_question(q_lower: str) -> tuple[frozenset[str], frozenset[str]]:
+    """
+    Keyword families hit and word set of a lowercased question.
+    Shared by the classifiers below, so each question is scanned once.
+    """
+    return _QUESTION_MATCHER.scan(q_lower), frozenset(_WORD_RE.findall(q_lower))
+
+def _mentions_defeat(hits: frozenset[str], words: frozenset[str]) -> bool:
+    return "defeat" in hits or not DEFEAT_WORDS.isdisjoint(words)
+
+# Classifiers are pure functions of their string arguments, so repeated
+# questions (REPL, benchmark reruns) skip the matching entirely.
+# Each exposes cache_clear().
+CLASSIFIER_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def is_question_ambiguous(q_lower: str) -> bool:
+    hits, _ = _scan_question(q_lower)
+    if "ambiguous" in hits:
         return True
-    if any(k in q for k in RECORD_KEYWORDS) and not any(s in q for s in SCOPE_KEYWORDS):
+    if "record" in hits and "scope" not in hits:
         return True
     return False
 
-def classify_intent(question: str) -> str | None:
-    q = question.lower()
-    if (
-        any(p in q for p in ["le gano a","le ganó a","derroto a","derrotó a","beat","defeated"])
-        and ("mismo torneo" in q or "same tournament" in q)
-    ):
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def classify_intent(question: str, q_lower: str) -> str | None:
+    """
+    question keeps its original case (needed by the name patterns),
+    q_lower is question.strip().lower(), computed once by the caller.
+    """
+    # Short questions with a fixed shape skip the keyword scan entirely.
+    if _TOP_PLAYERS_RE.match(q_lower):
+        return "top_ranked_players"
+
+    hits, words = _scan_question(q_lower)
+    if _mentions_defeat(hits, words) and "same_tournament" in hits:
         return "same_tournament_multi_defeat"
 
+    # Set checks first; the year regex only runs when both pass.
     if (
-        ("final" in q or "final de" in q)
-        and re.search(r"\b(19|20)\d{2}\b", question)
-        and any(t in q for t in ["wimbledon","roland garros","us open","australian open"])
+        not FINAL_WORDS.isdisjoint(words)
+        and "major" in hits
+        and _YEAR_RE.search(question)
     ):
         return "ranking_at_final"
 
+    if (
+        "grand_slam" in hits
+        and not TITLE_WORDS.isdisjoint(words)
+        and NOT_TITLE_WORDS.isdisjoint(words)
+        and FINAL_WORDS.isdisjoint(words)
+        and not _mentions_defeat(hits, words)
+    ):
+        return "grand_slam_titles"
+
     return None
 
-def build_same_tournament_multi_defeat_query(question: str) -> str | None:
-    q_lower = question.lower()
-    trigger_phrases = ["le gano a","le ganó a","derroto a","derrotó a","beat","defeated"]
-    if not any(p in q_lower for p in trigger_phrases):
-        return None
-    if "mismo torneo" not in q_lower and "same tournament" not in q_lower:
+MULTI_DEFEAT_OPPONENTS = 3
+
+def _render_multi_defeat_sql(n: int) -> str:
+    opponent_subquery = """
+        SELECT player_id FROM players
+        WHERE lower(first_name)=lower(?)
+          AND lower(last_name)=lower(?)
+        """
+    union_block = "\nUNION\n".join([opponent_subquery] * n)
+    return f"""
+SELECT DISTINCT p.first_name, p.last_name
+FROM matches m
+JOIN players p ON p.player_id = m.winner_id
+WHERE m.loser_id IN (
+{union_block}
+)
+GROUP BY m.winner_id, m.tourney_id
+HAVING COUNT(DISTINCT m.loser_id) = {n};
+""".strip()
+
+# Rendered once: every multi-defeat question sends the same statement text,
+# so SQLite's statement cache can reuse the prepared handle.
+_MULTI_DEFEAT_SQL = _render_multi_defeat_sql(MULTI_DEFEAT_OPPONENTS)
+
+def build_same_tournament_multi_defeat_query(question: str, q_lower: str) -> tuple[str, tuple] | None:
+    hits, words = _scan_question(q_lower)
+    if not _mentions_defeat(hits, words) or "same_tournament" not in hits:
         return None
 
-    name_pattern = r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\b"
-    candidates = re.findall(name_pattern, question)
+    candidates = _NAME_RE.findall(question)
     if not candidates:
         return None
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    detected_players = []
+    # Order-preserving dedupe, so repeated names are not sent to SQLite twice.
+    names = []
+    seen = set()
     for full_name in candidates:
         parts = full_name.strip().split()
         if len(parts) < 2:
             continue
-        first, last = parts[0], parts[-1]
-        cur.execute(
-            """SELECT player_id FROM players
-               WHERE lower(first_name)=lower(?) AND lower(last_name)=lower(?)""",
-            (first, last),
+        key = (parts[0], parts[-1])
+        if key not in seen:
+            seen.add(key)
+            names.append(key)
+    if not names:
+        return None
+
+    # One round-trip for every candidate instead of one query per name.
+    placeholders = ",".join(["(?,?)"] * len(names))
+    lookup_params = [part.lower() for name in names for part in name]
+    known = {
+        (first, last)
+        for first, last in get_conn(DB_PATH).execute(
+            f"""SELECT lower(first_name), lower(last_name) FROM players
+                WHERE (lower(first_name), lower(last_name)) IN (VALUES {placeholders})""",
+            lookup_params,
         )
-        if cur.fetchone():
-            detected_players.append((first, last))
+    }
 
-    conn.close()
-    detected_players = list(dict.fromkeys(detected_players))
-    if len(detected_players) < 3:
+    detected_players = []
+    for first, last in names:
+        if (first.lower(), last.lower()) in known:
+            detected_players.append((first, last))
+            if len(detected_players) == MULTI_DEFEAT_OPPONENTS:
+                break
+    else:
+        # Loop ran out before finding enough known opponents.
         return None
 
-    full_names = detected_players[:3]
-    opponent_subqueries = []
-    for first, last in full_names:
-        opponent_subqueries.append(f"""
-        SELECT player_id FROM players
-        WHERE lower(first_name)=lower('{first}')
-          AND lower(last_name)=lower('{last}')
-        """)
-    union_block = "\nUNION\n".join(opponent_subqueries)
+    params = tuple(part for name in detected_players for part in name)
+    return _MULTI_DEFEAT_SQL, params
 
-    return f"""
-SELECT DISTINCT p.first_name, p.last_name
-FROM matches m
-JOIN players p ON p.player_id = m.winner_id
-WHERE m.loser_id IN (
-{union_block}
-)
-GROUP BY m.winner_id, m.tourney_id
-HAVING COUNT(DISTINCT m.loser_id) = 3;
-""".strip()
-
-def build_final_ranking_query(question: str) -> str | None:
-    q_lower = question.lower()
+# Pure function of the question (no DB lookup), so it is memoized like the
+# classifiers. The builders that resolve players against the DB are not:
+# their answer changes when the data does.
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def build_final_ranking_query(question: str, q_lower: str) -> tuple[str, tuple] | None:
     if "final" not in q_lower and "final de" not in q_lower:
         return None
 
-    year_match = re.search(r"\b(19|20)\d{2}\b", question)
+    year_match = _YEAR_RE.search(question)
     if not year_match:
         return None
-    year = year_match.group(0)
+    # Half-open range on the raw column (not strftime) so the
+    # (tourney_name, match_date) index can seek straight to the season.
+    year = int(year_match.group(0))
+    year_start, year_end = f"{year}-01-01", f"{year + 1}-01-01"
 
-    tourney_pattern = r"(Wimbledon|Roland Garros|US Open|Australian Open)"
-    tourney_match = re.search(tourney_pattern, question, re.IGNORECASE)
+    tourney_match = _TOURNEY_RE.search(question)
     if not tourney_match:
         return None
     tourney_name = tourney_match.group(0)
 
-    name_pattern = r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\b"
-    players = re.findall(name_pattern, question)
+    players = _NAME_RE.findall(question)
     if len(players) < 2:
         return None
 
     p1 = players[0].split()
     p2 = players[1].split()
 
-    return f"""
+    sql = """
 SELECT
     (
         SELECT r.rank
         FROM rankings r
         WHERE r.player_id = (
             SELECT player_id FROM players
-            WHERE lower(first_name)=lower('{p1[0]}')
-              AND lower(last_name)=lower('{p1[-1]}')
+            WHERE lower(first_name)=lower(?)
+              AND lower(last_name)=lower(?)
         )
         AND r.ranking_date <= m.match_date
         ORDER BY r.ranking_date DESC
@@ -143,27 +254,112 @@ SELECT
         FROM rankings r
         WHERE r.player_id = (
             SELECT player_id FROM players
-            WHERE lower(first_name)=lower('{p2[0]}')
-              AND lower(last_name)=lower('{p2[-1]}')
+            WHERE lower(first_name)=lower(?)
+              AND lower(last_name)=lower(?)
         )
         AND r.ranking_date <= m.match_date
         ORDER BY r.ranking_date DESC
         LIMIT 1
     ) AS player2_rank
 FROM matches m
-WHERE m.tourney_name = '{tourney_name}'
+WHERE m.tourney_name = ?
   AND m.round = 'F'
-  AND strftime('%Y', m.match_date) = '{year}'
+  AND m.match_date >= ?
+  AND m.match_date < ?
 LIMIT 1;
 """.strip()
+    return sql, (p1[0], p1[-1], p2[0], p2[-1], tourney_name, year_start, year_end)
+
+# Capitalized words of the question that are never a player name.
+_GRAND_SLAM_TITLE_WORDS = frozenset({"Grand","Slam","Slams"})
+
+# Every word the template accounts for, besides the player's names. Any
+# other word (a year, "after", a surface, an opponent...) is a constraint
+# the template would ignore, so such questions go to the LLM.
+_GRAND_SLAM_FILLER_WORDS = TITLE_WORDS | frozenset({
+    "how","many","did","does","has","have","had","in","his","her","their",
+    "career","total","number","of","the","grand","slam","slams",
+    "cuantos","cuántos","cuántas","cuantas","ha","de","en","su","torneos",
+})
+
+_GRAND_SLAM_TITLES_SQL = """
+SELECT COUNT(*)
+FROM matches m
+WHERE m.winner_id = ?
+  AND m.tour = ?
+  AND m.round = 'F'
+  AND m.tourney_level = 'G';
+""".strip()
+
+def build_grand_slam_titles_query(question: str, q_lower: str) -> tuple[str, tuple] | None:
+    """
+    Grand Slam titles of one player, named by surname ("Federer") or by
+    full name. Returns None unless exactly one player matches, so shared
+    surnames (Murray, Williams) still go to the LLM, and when the question
+    has any other constraint (year, surface, opponent).
+    """
+    tokens = {
+        word.lower() for word in _CAPITALIZED_RE.findall(question)
+        if word not in _GRAND_SLAM_TITLE_WORDS
+    }
+    if not tokens:
+        return None
+
+    _, words = _scan_question(q_lower)
+    if not words <= _GRAND_SLAM_FILLER_WORDS | tokens:
+        return None
+
+    placeholders = ",".join(["?"] * len(tokens))
+    rows = get_conn(DB_PATH).execute(
+        f"""SELECT player_id, gender, lower(first_name) FROM players
+            WHERE lower(last_name) IN ({placeholders})""",
+        tuple(tokens),
+    ).fetchall()
+
+    # A matching first name in the question narrows a shared surname down.
+    full_name = [row for row in rows if row[2] in tokens]
+    players = {(player_id, gender) for player_id, gender, _ in (full_name or rows)}
+    if len(players) != 1:
+        return None
+
+    return _GRAND_SLAM_TITLES_SQL, players.pop()
+
+
+# Latest ranking week of the tour; both lookups are served by
+# idx_rankings_gender_date_rank.
+_TOP_RANKED_PLAYERS_SQL = """
+SELECT p.first_name, p.last_name, r.rank, r.points
+FROM rankings r
+JOIN players p ON p.player_id = r.player_id
+WHERE r.gender = ?
+  AND p.gender = ?
+  AND r.ranking_date = (
+      SELECT MAX(r2.ranking_date)
+      FROM rankings r2
+      WHERE r2.gender = ?
+  )
+  AND r.rank <= ?
+ORDER BY r.rank ASC;
+""".strip()
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def build_top_ranked_players_query(question: str, q_lower: str) -> tuple[str, tuple] | None:
+    """
+    Current top-N ranking of one tour (ATP unless WTA is named).
+    No LLM call: the whole question is one fixed shape.
+    """
+    match = _TOP_PLAYERS_RE.match(q_lower)
+    if not match:
+        return None
+
+    count, tour = match.groups()
+    n = int(count) if count.isdigit() else NUMBER_WORDS[count]
+
+    tour = (tour or "atp").upper()
+    return _TOP_RANKED_PLAYERS_SQL, (tour, tour, tour, n)
 
-FOLLOWUP_TOURNEY_PATTERNS = [
-    "en que torneo",
-    "en qué torneo",
-    "which tournament",
-    "what tournament"
-]
 
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
 def is_followup_tourney_question(question: str, last_sql: str | None) -> bool:
     """
     Detects if this question is a contextual follow-up asking
@@ -174,7 +370,8 @@ def is_followup_tourney_question(question: str, last_sql: str | None) -> bool:
 
     q_norm = question.strip().lower()
 
-    if not any(p in q_norm for p in FOLLOWUP_TOURNEY_PATTERNS):
+    hits, _ = _scan_question(q_norm)
+    if "followup_tourney" not in hits:
         return False
 
     # Only allow deterministic follow-up if previous SQL was multi-defeat query
@@ -1,7 +1,10 @@
 import sqlite3
 import re
 from pathlib import Path
+from dataclasses import dataclass
 from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
 
 DB_PATH = Path("data/guru.db")
 
@@ -56,22 +59,60 @@ To compute player-level totals, use CASE on winner_id and loser_id.
 # Schema loading (cached)
 # -------------------------------------------------
 
+@dataclass(frozen=True, slots=True)
+class SchemaCache:
+    # table -> column names (read-only view: shared by every caller)
+    tables: Mapping[str, frozenset[str]]
+    # every column name across tables, for the per-query validation
+    all_columns: frozenset[str]
+
+
 @lru_cache(maxsize=1)
-def get_db_schema(db_path: Path = DB_PATH) -> dict[str, set[str]]:
+def load_schema(db_path: Path = DB_PATH) -> SchemaCache:
+    """
+    Reads the schema once per process; the flattened column set is
+    built here too, so validation never re-flattens it.
+    """
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
 
-    schema: dict[str, set[str]] = {}
+    tables: dict[str, frozenset[str]] = {}
     cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [row[0] for row in cur.fetchall()]
+    table_names = [row[0] for row in cur.fetchall()]
 
-    for table in tables:
+    for table in table_names:
         cur.execute(f"PRAGMA table_info({table});")
-        columns = {row[1] for row in cur.fetchall()}
-        schema[table] = columns
+        tables[table] = frozenset(row[1] for row in cur.fetchall())
 
     conn.close()
-    return schema
+    return SchemaCache(
+        tables=MappingProxyType(tables),
+        all_columns=frozenset().union(*tables.values()),
+    )
+
+
+def get_db_schema(db_path: Path = DB_PATH) -> Mapping[str, frozenset[str]]:
+    return load_schema(db_path).tables
+
+
+def get_all_columns(db_path: Path = DB_PATH) -> frozenset[str]:
+    """
+    Flattened set of every column name in the DB, computed once per process.
+    """
+    return load_schema(db_path).all_columns
+
+
+def reload_schema() -> None:
+    """
+    Drops the cached schema (e.g. after a rebuild added columns) and the
+    statements already validated against it; the next validation
+    re-reads the schema from the DB.
+    """
+    # Imported here: sql_executor imports this module.
+    from .sql_executor import clear_validated_sql
+
+    load_schema.cache_clear()
+    clear_validated_sql()
 
 
 
@@ -79,20 +120,17 @@ def get_db_schema(db_path: Path = DB_PATH) -> dict[str, set[str]]:
 # Identifier extraction (safe minimal version)
 # -------------------------------------------------
 
+# String literals are consumed by the first branches (group 1 stays None),
+# so one left-to-right scan skips them and captures alias.column.
+_IDENT_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\b[a-zA-Z_][a-zA-Z0-9_]*\.(\w+)\b")
+
 def extract_identifiers(sql: str) -> set[str]:
     """
     Extract only column names referenced as alias.column.
     This avoids false positives from SQL keywords, functions,
     aliases, table names, etc.
     """
-    # Remove string literals
-    sql = re.sub(r"'[^']*'", "", sql)
-    sql = re.sub(r'"[^"]*"', "", sql)
-
-    # Extract only alias.column patterns
-    matches = re.findall(r"\b[a-zA-Z_][a-zA-Z0-9_]*\.(\w+)\b", sql)
-
-    return set(matches)
+    return {m.group(1) for m in _IDENT_RE.finditer(sql) if m.group(1)}
 
 
 # -------------------------------------------------
@@ -100,20 +138,10 @@ def extract_identifiers(sql: str) -> set[str]:
 # -------------------------------------------------
 
 def validate_schema(sql: str, db_path: Path = DB_PATH) -> None:
-    schema = get_db_schema(db_path)
-
     identifiers = extract_identifiers(sql)
 
-    # Build set of real DB columns
-    all_columns = set()
-    for cols in schema.values():
-        all_columns.update(cols)
-
     # Only validate actual column names
-    unknown = [
-        col for col in identifiers
-        if col not in all_columns
-    ]
+    unknown = identifiers - get_all_columns(db_path)
 
     if unknown:
-        raise ValueError(f"Unknown columns detected: {unknown}")
\ No newline at end of file
+        raise ValueError(f"Unknown columns detected: {sorted(unknown)}")
@@ -1,5 +1,46 @@
+from __future__ import annotations
+
 import re
+from typing import TYPE_CHECKING
+
+# sqlglot is only needed once a surface synonym is detected; it is
+# imported there to keep it off the startup path.
+if TYPE_CHECKING:
+    from sqlglot import exp
+
+# Canonical surface -> synonyms, in priority order. Each canonical gets one
+# word-boundary alternation, compiled once at import: one search per
+# surface instead of one per synonym.
+SURFACE_SYNONYMS = (
+    ("clay", ("tierra batida", "polvo de ladrillo", "arcilla", "clay", "tierra")),
+    ("grass", ("hierba", "césped", "cesped", "grass")),
+    ("hard", ("cancha dura", "cemento", "dura", "hard")),
+    ("carpet", ("carpet",)),
+)
+
+_SURFACE_SYNONYM_RES = tuple(
+    (canonical, re.compile(r"\b(?:" + "|".join(map(re.escape, synonyms)) + r")\b"))
+    for canonical, synonyms in SURFACE_SYNONYMS
+)
+
 
+def _surface_column(node: exp.Expression) -> exp.Column | None:
+    """surface / m.surface / lower(m.surface) -> the Column node, else None."""
+    from sqlglot import exp
+
+    if isinstance(node, exp.Lower):
+        node = node.this
+    if isinstance(node, exp.Column) and node.name.lower() == "surface":
+        return node
+    return None
+
+
+def _is_string_literal(node: exp.Expression) -> bool:
+    from sqlglot import exp
+
+    if isinstance(node, exp.Lower):
+        node = node.this
+    return isinstance(node, exp.Literal) and node.is_string
 
 class SemanticGuard:
     """
@@ -19,7 +60,7 @@ class SemanticGuard:
     """
 
     @staticmethod
-    def _normalize_surface_literals(question: str, sql: str) -> str:
+    def _normalize_surface_literals(q_lower: str, sql: str) -> str:
         """
         Non-invasive normalization of surface literals.
 
@@ -27,58 +68,62 @@ class SemanticGuard:
         normalize existing surface comparisons to canonical values.
 
         This method never injects new filters.
-        It only rewrites existing surface = 'X' comparisons.
-        """
+        It only rewrites existing surface = 'X' comparisons, working on
+        the parsed SQL so string literals and qualified columns
+        (m.surface) are handled correctly.
 
-        q = question.lower()
-
-        surface_map = {
-            "clay": ["tierra batida", "polvo de ladrillo", "arcilla", "clay", "tierra"],
-            "grass": ["hierba", "césped", "cesped", "grass"],
-            "hard": ["cancha dura", "cemento", "dura", "hard"],
-            "carpet": ["carpet"],
-        }
+        q_lower is the question already stripped and lowercased
+        by the engine.
+        """
 
         detected = None
-        for canonical, synonyms in surface_map.items():
-            for s in synonyms:
-                if re.search(r"\b" + re.escape(s) + r"\b", q):
-                    detected = canonical
-                    break
-            if detected:
+        for canonical, synonym_re in _SURFACE_SYNONYM_RES:
+            if synonym_re.search(q_lower):
+                detected = canonical
                 break
 
         if not detected:
             return sql
 
-        # Rewrite only existing surface comparisons (lower(surface) = lower('X'))
-        sql = re.sub(
-            r"(lower\s*\(\s*surface\s*\)\s*=\s*lower\s*\(\s*'[^']+'\s*\))",
-            f"lower(surface) = lower('{detected}')",
-            sql,
-            flags=re.IGNORECASE,
-        )
+        import sqlglot
+        from sqlglot import exp
 
-        # Rewrite plain surface = 'X' → force LOWER comparison
-        sql = re.sub(
-            r"\bsurface\s*=\s*'[^']+'",
-            f"lower(surface) = lower('{detected}')",
-            sql,
-            flags=re.IGNORECASE,
-        )
+        try:
+            tree = sqlglot.parse_one(sql, read="sqlite")
+        except sqlglot.errors.SqlglotError:
+            return sql
 
-        # Rewrite surface IN (...) → force canonical LOWER comparison
-        sql = re.sub(
-            r"\bsurface\s+IN\s*\([^)]*\)",
-            f"lower(surface) = lower('{detected}')",
-            sql,
-            flags=re.IGNORECASE,
-        )
+        changed = False
+
+        def rewrite(node: exp.Expression) -> exp.Expression:
+            nonlocal changed
+            column = _surface_column(node.this) if isinstance(node, (exp.EQ, exp.In)) else None
+            if column is None:
+                return node
+
+            # surface = 'X' / lower(surface) = lower('X')
+            if isinstance(node, exp.EQ) and not _is_string_literal(node.expression):
+                return node
+            # surface IN ('X', 'Y') (subqueries are left alone)
+            if isinstance(node, exp.In) and (
+                node.args.get("query")
+                or not all(_is_string_literal(e) for e in node.expressions)
+            ):
+                return node
+
+            changed = True
+            return exp.EQ(
+                this=exp.Lower(this=column.copy()),
+                expression=exp.Lower(this=exp.Literal.string(detected)),
+            )
+
+        tree = tree.transform(rewrite)
 
-        return sql
+        # Untouched SQL is returned as written by the LLM
+        return tree.sql(dialect="sqlite") if changed else sql
 
     @staticmethod
-    def validate_and_autofix(question: str, sql: str) -> str:
+    def validate_and_autofix(q_lower: str, sql: str) -> str:
         """
         Minimal post-processing layer.
         """
@@ -91,7 +136,7 @@ class SemanticGuard:
 
         # 2) Light surface normalization
         corrected_sql = SemanticGuard._normalize_surface_literals(
-            question,
+            q_lower,
             corrected_sql,
         )
 
@@ -1,40 +1,290 @@
+import hashlib
 import re
-import time
 import sqlite3
+import threading
+from itertools import islice
 from pathlib import Path
-from .schema import DB_PATH, validate_schema
+from typing import Iterator
+from .schema import DB_PATH, get_all_columns
+
+# Applied once per connection. Connections are opened read-only (mode=ro);
+# query_only is kept as a second guard, the rest tunes repeated analytical reads.
+SQLITE_PRAGMAS = (
+    "PRAGMA query_only=ON",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Indexes backing the deterministic templates in router.py and the filters
+# the LLM keeps generating (player + round + level, rank-1 lookups).
+# Names must not clash with the ones in src/db/schema.sql
+# (CREATE INDEX IF NOT EXISTS would silently keep the older definition).
+ENGINE_INDEXES = {
+    "idx_matches_loser_tourney": "ON matches(loser_id, tourney_id, winner_id)",
+    "idx_matches_winner_round_level": "ON matches(winner_id, round, tourney_level, tour)",
+    "idx_matches_loser_round_level": "ON matches(loser_id, round, tourney_level, tour)",
+    "idx_matches_tourney_date": "ON matches(tourney_name, match_date)",
+    "idx_rankings_pid_date": "ON rankings(player_id, ranking_date DESC)",
+    "idx_rankings_rank_gender_pid": "ON rankings(rank, gender, player_id)",
+    "idx_rankings_gender_date_rank": "ON rankings(gender, ranking_date, rank)",
+    "idx_players_lower_name": "ON players(lower(last_name), lower(first_name))",
+}
+
+# Earlier ENGINE_INDEXES now covered by a wider one above (same leading columns)
+SUPERSEDED_INDEXES = ("idx_matches_winner_round",)
+
+# Prepared statements kept per connection (sqlite3 default: 128). Templates
+# and literal-parameterized LLM SQL repeat, so re-parsing is skipped.
+CACHED_STATEMENTS = 256
+
+# Rows pulled from SQLite per fetchmany() call
+FETCH_BATCH_SIZE = 1000
+
+_FORBIDDEN_RE = re.compile(r"\b(drop|delete|update|insert|alter)\b")
+
+# validate_statement's single scan over the lowercased SQL: string literals
+# (group 1, searched for forbidden words separately), forbidden keywords
+# (group 2) and alias.column references (group 3).
+_STATEMENT_TOKEN_RE = re.compile(
+    r"""('[^']*'|"[^"]*")"""
+    r"|\b(drop|delete|update|insert|alter)\b"
+    r"|\b[a-z_][a-z0-9_]*\.(\w+)\b"
+)
+
+# Digests of statements that already passed validate_statement in this
+# process (the column set is cached per process too). Reset when full.
+_VALIDATED_SQL: set[bytes] = set()
+MAX_VALIDATED_SQL = 4096
+
+# Comments and "quoted identifiers" are skipped; 'string literals' become
+# parameters unless they are used as an alias (AS 'name').
+_LITERAL_RE = re.compile(
+    r"""(--[^\n]*|/\*.*?\*/|"(?:[^"]|"")*")|(\bas\s+)?'((?:[^']|'')*)'""",
+    re.IGNORECASE | re.DOTALL,
+)
+
+class QueryTimeoutError(TimeoutError):
+    """Raised when a query is interrupted by its timeout_seconds timer."""
+
+
+def open_connection(db_path: Path = DB_PATH, uri: str | None = None) -> sqlite3.Connection:
+    """
+    Opens a long-lived, read-only connection meant to be reused across
+    queries (page cache and mmap'd pages survive between questions).
+    The file is opened with mode=ro, so SQLite never takes write locks
+    for it; schema changes go through ensure_indexes. uri, when given,
+    replaces the file URI (e.g. an in-memory copy, see db.load_into_memory).
+    """
+    conn = sqlite3.connect(
+        uri or f"{Path(db_path).resolve().as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def ensure_indexes(db_path: Path = DB_PATH) -> None:
+    """
+    Creates any missing ENGINE_INDEXES and refreshes planner statistics,
+    through a short-lived read-write connection. Also switches the file
+    to WAL so read-only connections run alongside a rebuild in another
+    process. Run by the setup step (src/db/rebuild_snapshot.py), not by
+    the engine. Indexes are an optimization only: a missing, read-only
+    or not-yet-loaded DB is left untouched.
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return
+
+    conn = None
+    try:
+        # mode=rw: never creates the file
+        conn = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=rw", uri=True, isolation_level=None
+        )
+        # Persistent setting; fails on a read-only file, which is fine.
+        conn.execute("PRAGMA journal_mode=WAL")
+        existing = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        }
+        missing = [name for name in ENGINE_INDEXES if name not in existing]
+        superseded = [name for name in SUPERSEDED_INDEXES if name in existing]
+        if not (missing or superseded):
+            return
+        for name in superseded:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for name in missing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} {ENGINE_INDEXES[name]}")
+        conn.execute("ANALYZE")
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        if conn is not None:
+            conn.close()
+
+def _check_read_only(sql_clean: str) -> None:
+    if not sql_clean.startswith("select"):
+        raise ValueError("Only SELECT queries are allowed.")
+
+    match = _FORBIDDEN_RE.search(sql_clean)
+    if match:
+        raise ValueError(f"Forbidden keyword detected: {match.group(1)}")
 
 def validate_sql(sql: str) -> None:
+    _check_read_only(sql.strip().lower())
+
+def validate_statement(sql: str, db_path: Path = DB_PATH) -> None:
+    """
+    validate_sql + validate_schema fused into one scan over a single
+    lowercased copy of the SQL. Column names in the DB are lowercase and
+    SQLite identifiers are case-insensitive, so the schema check works on
+    the same string.
+    """
+    digest = hashlib.blake2b(f"{db_path}\0{sql}".encode(), digest_size=16).digest()
+    if digest in _VALIDATED_SQL:
+        return
+
     sql_clean = sql.strip().lower()
     if not sql_clean.startswith("select"):
         raise ValueError("Only SELECT queries are allowed.")
 
-    forbidden = ["drop", "delete", "update", "insert", "alter"]
-    for word in forbidden:
-        if re.search(rf"\b{word}\b", sql_clean):
-            raise ValueError(f"Forbidden keyword detected: {word}")
+    # One pass collects referenced columns and stops at the first
+    # forbidden keyword (same one _FORBIDDEN_RE.search would report).
+    identifiers = set()
+    for match in _STATEMENT_TOKEN_RE.finditer(sql_clean):
+        literal, forbidden, column = match.groups()
+        if literal:
+            inner = _FORBIDDEN_RE.search(literal)
+            forbidden = inner.group(1) if inner else None
+        if forbidden:
+            raise ValueError(f"Forbidden keyword detected: {forbidden}")
+        if column:
+            identifiers.add(column)
+
+    unknown = identifiers - get_all_columns(db_path)
+    if unknown:
+        raise ValueError(f"Unknown columns detected: {sorted(unknown)}")
+
+    if len(_VALIDATED_SQL) >= MAX_VALIDATED_SQL:
+        _VALIDATED_SQL.clear()
+    _VALIDATED_SQL.add(digest)
+
+def clear_validated_sql() -> None:
+    """Forgets every statement validate_statement accepted (see schema.reload_schema)."""
+    _VALIDATED_SQL.clear()
+
+def stream_query(
+    sql: str,
+    params: tuple,
+    conn: sqlite3.Connection,
+    timeout_seconds: int = 30,
+) -> Iterator[tuple]:
+    """
+    Yields result rows in batches of FETCH_BATCH_SIZE instead of
+    materializing the full result set. The timeout covers the whole
+    iteration, since SQLite keeps stepping the statement while rows
+    are fetched.
+    """
+    # sqlite3_interrupt() fired from a timer thread: no per-VM-step
+    # Python callback while the query runs. The event records that the
+    # timer (not some other interrupt) stopped the statement.
+    fired = threading.Event()
+
+    def on_timeout() -> None:
+        fired.set()
+        conn.interrupt()
 
-def run_query(sql: str, timeout_seconds: int = 30, db_path: Path = DB_PATH):
-    conn = sqlite3.connect(db_path)
+    timer = threading.Timer(timeout_seconds, on_timeout)
+    timer.start()
     cur = conn.cursor()
-    start_time = time.time()
+    try:
+        cur.arraysize = FETCH_BATCH_SIZE
+        cur.execute(sql, params)
+        for batch in iter(cur.fetchmany, []):
+            yield from batch
+    except sqlite3.OperationalError as e:
+        if fired.is_set():
+            raise QueryTimeoutError(
+                f"Query exceeded the {timeout_seconds}s timeout."
+            ) from e
+        raise
+    finally:
+        # Also reached when the caller stops early (close()): the statement
+        # is reset instead of being left half-stepped.
+        cur.close()
+        timer.cancel()
 
-    def progress_handler():
-        if time.time() - start_time > timeout_seconds:
-            return 1
-        return 0
+def _thread_conn(db_path: Path) -> sqlite3.Connection:
+    # Imported here: db builds its connections with open_connection.
+    from .db import get_conn
+    return get_conn(db_path)
 
-    conn.set_progress_handler(progress_handler, 100000)
+def run_query(
+    sql: str,
+    params: tuple = (),
+    conn: sqlite3.Connection | None = None,
+    timeout_seconds: int = 30,
+    db_path: Path = DB_PATH,
+    max_rows: int | None = None,
+):
+    """
+    Materializes the rows of stream_query. With max_rows, stops stepping
+    the statement once that many rows have been read. Without conn, the
+    calling thread's shared connection (db.get_conn) is used.
+    """
+    if conn is None:
+        conn = _thread_conn(db_path)
+
+    rows = stream_query(sql, params, conn, timeout_seconds=timeout_seconds)
     try:
-        cur.execute(sql)
-        results = cur.fetchall()
+        return list(rows if max_rows is None else islice(rows, max_rows))
     finally:
-        conn.set_progress_handler(None, 0)
-        conn.close()
+        rows.close()
+
+def parameterize_literals(sql: str) -> tuple[str, tuple]:
+    """
+    Replaces string literals with ? placeholders and returns
+    (template, params). Questions that differ only in names or
+    tournaments then share one statement text, so sqlite3's statement
+    cache returns the already-prepared statement instead of re-parsing.
+    """
+    params = []
+
+    def replace(match: re.Match) -> str:
+        if match.group(1) or match.group(2):
+            return match.group(0)
+        params.append(match.group(3).replace("''", "'"))
+        return "?"
+
+    template = _LITERAL_RE.sub(replace, sql)
+    return template, tuple(params)
+
+def execute_sql(
+    sql: str,
+    params: tuple = (),
+    conn: sqlite3.Connection | None = None,
+    timeout_seconds: int = 30,
+    db_path: Path = DB_PATH,
+    max_rows: int | None = None,
+):
+    if conn is None:
+        conn = _thread_conn(db_path)
+
+    # Validation always sees the SQL as written; only the statement handed
+    # to SQLite is templated. Already-parameterized SQL is left alone.
+    if not params and "'" in sql:
+        sql_to_run, params = parameterize_literals(sql)
+    else:
+        sql_to_run = sql
 
-    return results
+    # Syntax errors and unknown tables surface from the statement's own
+    # prepare in run_query: no separate EXPLAIN compile.
+    validate_statement(sql, db_path)
 
-def execute_sql(sql: str, timeout_seconds: int = 30, db_path: Path = DB_PATH):
-    validate_sql(sql)
-    validate_schema(sql, db_path=db_path)
-    return run_query(sql, timeout_seconds=timeout_seconds, db_path=db_path)
\ No newline at end of file
+    return run_query(
+        sql_to_run, params, conn, timeout_seconds=timeout_seconds, max_rows=max_rows
+    )
@@ -1,5 +1,28 @@
 import re
 
+# Compiled once at import; rewrite_structural runs on every LLM answer.
+
+# WHERE NOT EXISTS (
+#     SELECT 1 FROM table alias
+#     WHERE alias.col = outer.col
+#       AND ...
+# )
+_NOT_EXISTS_RE = re.compile(
+    r"""
+    where\s+not\s+exists\s*\(
+        \s*select\s+1\s+from\s+
+        (?P<table>[a-zA-Z_][a-zA-Z0-9_]*)\s+
+        (?P<alias>[a-zA-Z_][a-zA-Z0-9_]*)\s+
+        where\s+(?P<conditions>.+?)
+    \)
+    """,
+    re.IGNORECASE | re.DOTALL | re.VERBOSE,
+)
+_WHERE_RE = re.compile(r"\bwhere\b", re.IGNORECASE)
+_SUM_ACES_RE = re.compile(r"sum\s*\(\s*(?:m\.)?aces\s*\)", re.IGNORECASE)
+_EXISTS_RE = re.compile(r"\bexists\s*\([^)]*\)", re.IGNORECASE | re.DOTALL)
+_SELECT_RE = re.compile(r"^\s*select\s+", re.IGNORECASE)
+
 
 class SQLTransformer:
     """
@@ -21,10 +44,22 @@ class SQLTransformer:
         if not sql:
             return sql
 
-        sql = SQLTransformer._rewrite_aces_aggregation(sql)
+        # One lowercase scan decides which rewrites can apply at all.
+        # Most SQL contains none of these tokens and skips every regex.
+        lowered = sql.lower()
+        has_aces = "aces" in lowered
+        has_exists = "exists" in lowered
+        if not (has_aces or has_exists or "left join" in lowered):
+            return sql.strip()
+
+        if has_aces:
+            sql = SQLTransformer._rewrite_aces_aggregation(sql)
+
+        if has_exists:
+            sql = SQLTransformer._rewrite_not_exists(sql)
+            sql = SQLTransformer._strip_exists(sql)
 
-        sql = SQLTransformer._rewrite_not_exists(sql)
-        sql = SQLTransformer._strip_exists(sql)
+        # Also covers the LEFT JOIN introduced by the NOT EXISTS rewrite.
         sql = SQLTransformer._enforce_distinct_on_antijoin(sql)
 
         return sql.strip()
@@ -40,25 +75,7 @@ class SQLTransformer:
         if "not exists" not in lowered:
             return sql
 
-        # Handles pattern:
-        # WHERE NOT EXISTS (
-        #     SELECT 1 FROM table alias
-        #     WHERE alias.col = outer.col
-        #       AND ...
-        # )
-        pattern = re.compile(
-            r"""
-            where\s+not\s+exists\s*\(
-                \s*select\s+1\s+from\s+
-                (?P<table>[a-zA-Z_][a-zA-Z0-9_]*)\s+
-                (?P<alias>[a-zA-Z_][a-zA-Z0-9_]*)\s+
-                where\s+(?P<conditions>.+?)
-            \)
-            """,
-            re.IGNORECASE | re.DOTALL | re.VERBOSE,
-        )
-
-        match = pattern.search(sql)
+        match = _NOT_EXISTS_RE.search(sql)
 
         if not match:
             return sql
@@ -68,13 +85,13 @@ class SQLTransformer:
         conditions = match.group("conditions").strip()
 
         # Remove original NOT EXISTS block
-        sql_without = pattern.sub("", sql)
+        sql_without = _NOT_EXISTS_RE.sub("", sql)
 
         # Build LEFT JOIN
         join_clause = f" LEFT JOIN {table} {alias} ON {conditions} "
 
         # Inject join before first WHERE
-        where_match = re.search(r"\bwhere\b", sql_without, re.IGNORECASE)
+        where_match = _WHERE_RE.search(sql_without)
 
         if where_match:
             idx = where_match.start()
@@ -114,8 +131,7 @@ class SQLTransformer:
             return sql
 
         # Replace SUM(m.aces) or SUM(aces)
-        rewritten_sql = re.sub(
-            r"sum\s*\(\s*(?:m\.)?aces\s*\)",
+        rewritten_sql = _SUM_ACES_RE.sub(
             (
                 "SUM(CASE "
                 "WHEN m.winner_id = p.player_id THEN m.w_ace "
@@ -123,7 +139,6 @@ class SQLTransformer:
                 "ELSE 0 END)"
             ),
             sql,
-            flags=re.IGNORECASE,
         )
 
         return rewritten_sql
@@ -139,12 +154,7 @@ class SQLTransformer:
         remove it defensively to avoid engine policy violation.
         """
 
-        sql = re.sub(
-            r"\bexists\s*\([^)]*\)",
-            "",
-            sql,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
+        sql = _EXISTS_RE.sub("", sql)
 
         return sql
 
@@ -169,11 +179,6 @@ class SQLTransformer:
 
             if not has_group_by and not has_distinct:
                 # Inject DISTINCT right after SELECT
-                sql = re.sub(
-                    r"^\s*select\s+",
-                    "SELECT DISTINCT ",
-                    sql,
-                    flags=re.IGNORECASE,
-                )
+                sql = _SELECT_RE.sub("SELECT DISTINCT ", sql, count=1)
 
         return sql
\ No newline at end of file
@@ -7,6 +7,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 import sqlite3
+from src.core.sql_executor import ensure_indexes
 from src.setup.materialized_views import build_match_rank_snapshot
 
 DB_PATH = PROJECT_ROOT / "data" / "guru.db"
@@ -20,5 +21,9 @@ def rebuild():
     build_match_rank_snapshot(str(DB_PATH))
     print("Snapshot rebuilt successfully.")
 
+    # Indexes used by the engine's templates and common LLM filters
+    ensure_indexes(DB_PATH)
+    print("Engine indexes ready.")
+
 if __name__ == "__main__":
     rebuild()
\ No newline at end of file
@@ -86,6 +86,22 @@ CREATE TABLE matches (
     score TEXT
 );
 
+-- ========================================
+-- Ingest Manifest
+-- ========================================
+-- One row per raw CSV already loaded, with the
+-- file mtime at load time: loaders skip files
+-- that have not changed since
+-- ========================================
+
+DROP TABLE IF EXISTS ingest_manifest;
+
+CREATE TABLE ingest_manifest (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL
+);
+
 --
 
 CREATE INDEX IF NOT EXISTS idx_rankings_player_date 
@@ -106,5 +122,8 @@ ON matches(tourney_level);
 CREATE INDEX IF NOT EXISTS idx_matches_round 
 ON matches(round);
 
+CREATE INDEX IF NOT EXISTS idx_matches_date 
+ON matches(match_date);
+
 --
 
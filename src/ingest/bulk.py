@@ -0,0 +1,89 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+# pandas' pyarrow CSV engine parses multithreaded in C++; the default C
+# parser stays as the fallback when pyarrow is not installed. It does not
+# support chunksize, so chunked reads always use the C parser.
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# Rows per pd.read_csv chunk: bounds memory on the large ranking files.
+CHUNK_ROWS = 100_000
+
+# Bulk-load run only: the DB is rebuilt from data/raw if it is interrupted.
+BULK_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA journal_mode=MEMORY",
+)
+
+# Same layout as in src/db/schema.sql.
+MANIFEST_DDL = (
+    "CREATE TABLE IF NOT EXISTS ingest_manifest "
+    "(path TEXT PRIMARY KEY, mtime REAL NOT NULL, rows INTEGER NOT NULL)"
+)
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """
+    Connection for a loader run. Autocommit is off (sqlite3 opens one
+    transaction on the first INSERT), so the whole run is committed once.
+    Creates ingest_manifest when missing, so loaders also run against a
+    DB built before the manifest existed.
+    """
+    conn = sqlite3.connect(db_path)
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    conn.execute(MANIFEST_DDL)
+    return conn
+
+
+def _rows(df: pd.DataFrame):
+    # Same values to_sql("append") stored: datetimes as
+    # 'YYYY-MM-DD HH:MM:SS' text, NaN/NaT/NA as NULL, Python scalars.
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def insert_frame(
+    conn: sqlite3.Connection,
+    table: str,
+    df: pd.DataFrame,
+    or_ignore: bool = False,
+) -> None:
+    """
+    Inserts every row of df with one executemany. With or_ignore, rows
+    that hit the table's primary key are skipped (first one wins, like
+    drop_duplicates(keep="first")).
+    """
+    columns = list(df.columns)
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    sql = (
+        f"{verb} INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    conn.executemany(sql, _rows(df))
+
+
+def is_ingested(conn: sqlite3.Connection, file_path: Path) -> bool:
+    """True when file_path was already loaded and has not changed since."""
+    row = conn.execute(
+        "SELECT mtime FROM ingest_manifest WHERE path = ?", (str(file_path),)
+    ).fetchone()
+    return row is not None and row[0] == file_path.stat().st_mtime
+
+
+def record_ingested(conn: sqlite3.Connection, file_path: Path, rows: int) -> None:
+    # Same transaction as the file's inserts: both commit or neither does.
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_manifest (path, mtime, rows) VALUES (?, ?, ?)",
+        (str(file_path), file_path.stat().st_mtime, rows),
+    )
@@ -1,13 +1,59 @@
-import pandas as pd
-import sqlite3
+import sys
 from pathlib import Path
 
+# Ensure project root is in sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+from src.ingest.bulk import CSV_ENGINE, connect, insert_frame, is_ingested, record_ingested
+
 DB_PATH = Path("data/guru.db")
 RAW_PATH = Path("data/raw")
 
-def load_matches_for_tour(tour_folder, gender):
-    dfs = []
-
+MATCH_COLUMNS = [
+    "tour",
+    "tourney_id",
+    "tourney_name",
+    "surface",
+    "tourney_level",
+    "match_date",
+    "round",
+    "best_of",
+    "winner_id",
+    "loser_id",
+    "winner_rank",
+    "loser_rank",
+    "w_ace",
+    "l_ace",
+    "score",
+]
+
+
+# Parse types for the CSV columns that are kept. Nullable integer dtypes
+# keep ids/ranks integral with gaps as <NA>; everything else is never read.
+# Ace counts are read as text and coerced (see load_matches_file): some
+# seasons carry stray non-numeric values, and older ones lack the columns.
+_MATCH_DTYPES = {
+    "tourney_id": "string",
+    "tourney_name": "string",
+    "surface": "string",
+    "tourney_level": "string",
+    "tourney_date": "string",
+    "round": "string",
+    "best_of": "Int8",
+    "winner_id": "Int32",
+    "loser_id": "Int32",
+    "winner_rank": "Int32",
+    "loser_rank": "Int32",
+    "w_ace": "string",
+    "l_ace": "string",
+    "score": "string",
+}
+
+
+def match_files(tour_folder):
     folder_path = RAW_PATH / tour_folder
     files = sorted(
     f for f in folder_path.glob(f"{tour_folder.split('_')[1]}_matches_*.csv")
@@ -16,88 +62,72 @@ def load_matches_for_tour(tour_folder, gender):
     and "qual" not in f.name
     and "amateur" not in f.name
     )
+    # evitar posibles duplicados
+    return [f for f in files if "current" not in f.name]
+
+
+def load_matches_file(file_path, gender):
+    """One season file, cleaned: MATCH_COLUMNS, dated rows only."""
+    print(f"Loading {file_path.name}...")
+    # The pyarrow engine needs usecols as a list of columns that exist
+    header = pd.read_csv(file_path, nrows=0).columns
+    df = pd.read_csv(
+        file_path,
+        engine=CSV_ENGINE,
+        dtype=_MATCH_DTYPES,
+        usecols=[col for col in header if col in _MATCH_DTYPES],
+    )
 
-    for file_path in files:
-        if "current" in file_path.name:
-            continue  # evitar posibles duplicados
+    if "w_ace" not in df.columns:
+        df["w_ace"] = None
+    if "l_ace" not in df.columns:
+        df["l_ace"] = None
 
-        print(f"Loading {file_path.name}...")
-        df = pd.read_csv(file_path)
+    df["w_ace"] = pd.to_numeric(df["w_ace"], errors="coerce").astype("Int16")
+    df["l_ace"] = pd.to_numeric(df["l_ace"], errors="coerce").astype("Int16")
 
-        if "w_ace" not in df.columns:
-            df["w_ace"] = None
-        if "l_ace" not in df.columns:
-            df["l_ace"] = None
+    df["match_date"] = pd.to_datetime(df["tourney_date"], format="%Y%m%d", errors="coerce")
+    df["tour"] = gender
 
-        df["w_ace"] = pd.to_numeric(df["w_ace"], errors="coerce")
-        df["l_ace"] = pd.to_numeric(df["l_ace"], errors="coerce")
-        
-        df["match_date"] = pd.to_datetime(df["tourney_date"], format="%Y%m%d", errors="coerce")
-        df["tour"] = gender
+    df = df[MATCH_COLUMNS]
+    return df[df["match_date"].notna()]
 
-        dfs.append(df)
 
-    return pd.concat(dfs, ignore_index=True)
+def insert_matches(conn, tour_folder, gender):
+    """
+    Loads every season file not yet in ingest_manifest (or changed since),
+    one file in memory at a time. Returns the rows inserted.
+    """
+    rows = 0
+    for file_path in match_files(tour_folder):
+        if is_ingested(conn, file_path):
+            print(f"Skipping {file_path.name} (already loaded)")
+            continue
+        df = load_matches_file(file_path, gender)
+        insert_frame(conn, "matches", df)
+        record_ingested(conn, file_path, len(df))
+        rows += len(df)
+    return rows
 
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
 
     # ATP
     print("Loading ATP matches...")
-    atp_df = load_matches_for_tour("tennis_atp", "ATP")
-
-    atp_clean = atp_df[[
-        "tour",
-        "tourney_id",
-        "tourney_name",
-        "surface",
-        "tourney_level",
-        "match_date",
-        "round",
-        "best_of",
-        "winner_id",
-        "loser_id",
-        "winner_rank",
-        "loser_rank",
-        "w_ace",
-        "l_ace",
-        "score"
-    ]].copy()
-    atp_clean = atp_clean[atp_clean["match_date"].notna()]
-
-    atp_clean.to_sql("matches", conn, if_exists="append", index=False)
+    atp_rows = insert_matches(conn, "tennis_atp", "ATP")
 
     # WTA
     print("Loading WTA matches...")
-    wta_df = load_matches_for_tour("tennis_wta", "WTA")
-
-    wta_clean = wta_df[[
-        "tour",
-        "tourney_id",
-        "tourney_name",
-        "surface",
-        "tourney_level",
-        "match_date",
-        "round",
-        "best_of",
-        "winner_id",
-        "loser_id",
-        "winner_rank",
-        "loser_rank",
-        "w_ace",
-        "l_ace",
-        "score"
-    ]].copy()
-    wta_clean = wta_clean[wta_clean["match_date"].notna()]
-
-    wta_clean.to_sql("matches", conn, if_exists="append", index=False)
+    wta_rows = insert_matches(conn, "tennis_wta", "WTA")
 
+    # Single commit for the whole load
+    conn.commit()
     conn.close()
 
     print("Matches loaded successfully.")
-    print(f"ATP matches: {len(atp_clean)}")
-    print(f"WTA matches: {len(wta_clean)}")
+    print(f"ATP matches: {atp_rows}")
+    print(f"WTA matches: {wta_rows}")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,24 @@
-import pandas as pd
-import sqlite3
+import sys
 from pathlib import Path
 
+# Ensure project root is in sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+from src.ingest.bulk import connect, insert_frame, is_ingested, record_ingested
+
 DB_PATH = Path("data/guru.db")
 RAW_PATH = Path("data/raw")
 
 
+def players_file(tour_folder):
+    return RAW_PATH / tour_folder / f"{tour_folder.split('_')[1]}_players.csv"
+
+
 def load_players_for_tour(tour_folder, gender):
-    file_path = RAW_PATH / tour_folder / f"{tour_folder.split('_')[1]}_players.csv"
+    file_path = players_file(tour_folder)
 
     print(f"Loading {file_path.name}...")
 
@@ -44,24 +55,41 @@ def load_players_for_tour(tour_folder, gender):
     ]
 
 
+def insert_players(conn, tour_folder, gender):
+    """
+    Returns the number of players inserted. Repeated (player_id, gender)
+    rows are dropped by the primary key (INSERT OR IGNORE, first row wins).
+    Skips the file when ingest_manifest shows it unchanged since last load.
+    """
+    file_path = players_file(tour_folder)
+    if is_ingested(conn, file_path):
+        print(f"Skipping {file_path.name} (already loaded)")
+        return 0
+
+    df = load_players_for_tour(tour_folder, gender)
+    changes_before = conn.total_changes
+    insert_frame(conn, "players", df, or_ignore=True)
+    inserted = conn.total_changes - changes_before
+    record_ingested(conn, file_path, len(df))
+    return inserted
+
+
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
 
     # ATP
-    atp_df = load_players_for_tour("tennis_atp", "ATP")
-    atp_df = atp_df.drop_duplicates(subset=["player_id", "gender"])
-    atp_df.to_sql("players", conn, if_exists="append", index=False)
+    atp_rows = insert_players(conn, "tennis_atp", "ATP")
 
     # WTA
-    wta_df = load_players_for_tour("tennis_wta", "WTA")
-    wta_df = wta_df.drop_duplicates(subset=["player_id", "gender"])
-    wta_df.to_sql("players", conn, if_exists="append", index=False)
+    wta_rows = insert_players(conn, "tennis_wta", "WTA")
 
+    # Single commit for the whole load
+    conn.commit()
     conn.close()
 
     print("Players loaded successfully.")
-    print(f"ATP players: {len(atp_df)}")
-    print(f"WTA players: {len(wta_df)}")
+    print(f"ATP players: {atp_rows}")
+    print(f"WTA players: {wta_rows}")
 
 
 if __name__ == "__main__":
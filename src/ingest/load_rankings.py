@@ -1,65 +1,84 @@
-import pandas as pd
-import sqlite3
+import sys
 from pathlib import Path
 
+# Ensure project root is in sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+from src.ingest.bulk import CHUNK_ROWS, connect, insert_frame, is_ingested, record_ingested
+
 DB_PATH = Path("data/guru.db")
 RAW_PATH = Path("data/raw")
 
 DECADES = ["70s", "80s", "90s", "00s", "10s", "20s"]
 
 
-def load_rankings_for_tour(tour_folder, gender):
-    dfs = []
-
+def load_rankings_file(file_path, gender):
+    """
+    Yields the rankings of one decade file in chunks of CHUNK_ROWS,
+    already shaped like the rankings table.
+    """
+    print(f"Loading {file_path.name}...")
+    for df in pd.read_csv(file_path, chunksize=CHUNK_ROWS):
+        df["ranking_date"] = pd.to_datetime(df["ranking_date"], format="%Y%m%d")
+        df["gender"] = gender
+
+        df = df[["player", "ranking_date", "rank", "points", "gender"]]
+        yield df.rename(columns={"player": "player_id"})
+
+
+def insert_rankings(conn, tour_folder, gender):
+    """
+    Returns (rows read, rows inserted). Duplicates of
+    (player_id, ranking_date, gender) are dropped by the primary key
+    (INSERT OR IGNORE): chunks can repeat rows of earlier chunks.
+    Decade files already in ingest_manifest (and unchanged) are skipped.
+    """
+    read = inserted = 0
     for decade in DECADES:
         file_path = RAW_PATH / tour_folder / f"{tour_folder.split('_')[1]}_rankings_{decade}.csv"
 
-        if file_path.exists():
-            print(f"Loading {file_path.name}...")
-            df = pd.read_csv(file_path)
-
-            df["ranking_date"] = pd.to_datetime(df["ranking_date"], format="%Y%m%d")
-            df["gender"] = gender
+        if not file_path.exists():
+            continue
+        if is_ingested(conn, file_path):
+            print(f"Skipping {file_path.name} (already loaded)")
+            continue
 
-            dfs.append(df[["player", "ranking_date", "rank", "points", "gender"]])
-
-    return pd.concat(dfs, ignore_index=True)
+        file_rows = 0
+        changes_before = conn.total_changes
+        for df in load_rankings_file(file_path, gender):
+            insert_frame(conn, "rankings", df, or_ignore=True)
+            file_rows += len(df)
+        inserted += conn.total_changes - changes_before
+        record_ingested(conn, file_path, file_rows)
+        read += file_rows
+    return read, inserted
 
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
 
     # ---------------- ATP ----------------
     print("Loading ATP rankings...")
-    atp_df = load_rankings_for_tour("tennis_atp", "ATP")
-    atp_df.rename(columns={"player": "player_id"}, inplace=True)
-
-    print("ATP rows before dedup:", len(atp_df))
-    atp_df = atp_df.drop_duplicates(
-        subset=["player_id", "ranking_date", "gender"]
-    )
-    print("ATP rows after dedup:", len(atp_df))
-
-    atp_df.to_sql("rankings", conn, if_exists="append", index=False)
+    atp_read, atp_rows = insert_rankings(conn, "tennis_atp", "ATP")
+    print("ATP rows before dedup:", atp_read)
+    print("ATP rows after dedup:", atp_rows)
 
     # ---------------- WTA ----------------
     print("Loading WTA rankings...")
-    wta_df = load_rankings_for_tour("tennis_wta", "WTA")
-    wta_df.rename(columns={"player": "player_id"}, inplace=True)
-
-    print("WTA rows before dedup:", len(wta_df))
-    wta_df = wta_df.drop_duplicates(
-        subset=["player_id", "ranking_date", "gender"]
-    )
-    print("WTA rows after dedup:", len(wta_df))
-
-    wta_df.to_sql("rankings", conn, if_exists="append", index=False)
+    wta_read, wta_rows = insert_rankings(conn, "tennis_wta", "WTA")
+    print("WTA rows before dedup:", wta_read)
+    print("WTA rows after dedup:", wta_rows)
 
+    # Single commit for the whole load
+    conn.commit()
     conn.close()
 
     print("Rankings loaded successfully.")
-    print(f"Total ATP rows: {len(atp_df)}")
-    print(f"Total WTA rows: {len(wta_df)}")
+    print(f"Total ATP rows: {atp_rows}")
+    print(f"Total WTA rows: {wta_rows}")
 
 
 if __name__ == "__main__":
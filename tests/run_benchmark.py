@@ -1,22 +1,101 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
+import heapq
+import math
 import os
 import json
+import pickle
+import re
+import tempfile
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
+
+# orjson is optional (same as src/core/cache.py): identical JSON, encoded in C.
+try:
+    import orjson
+
+    def _ndjson_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    def _pretty_json(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _ndjson_line(obj) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+    def _pretty_json(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode()
 
 # Adjust path to import from src
 import sys
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.core.db import load_into_memory
 from src.core.engine import TennisGuruEngine
+from src.core.llm_generator import generate_sql_from_question
+from src.core.sql_executor import ensure_indexes, execute_sql
 
 STRESS_FILE = PROJECT_ROOT / "tests" / "stress_tests.txt"
+# Parsed questions, one pickle per (source text, parser) pair. Bump
+# STRESS_PARSER_VERSION whenever load_stress_tests() output changes.
+STRESS_CACHE_DIR = Path(tempfile.gettempdir()) / "tennis_guru"
+STRESS_PARSER_VERSION = 1
+
+# "[level]" or "[level][tag]" header preceding the questions it labels
+_META_RE = re.compile(r"^\[([^\]]+)\](?:\[([^\]]+)\])?\s*$")
 LOG_DIR = PROJECT_ROOT / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 LOG_FILE = LOG_DIR / "query_benchmark.json"
+# One JSON object per line, appended as each question finishes
+RESULTS_FILE = LOG_DIR / "query_benchmark.ndjson"
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (HDR-style): memory depends on the
+    range of values seen, not on how many were recorded. Reported
+    percentiles are within BUCKET_RATIO (2%) of the exact value.
+    """
+
+    BUCKET_RATIO = 1.02
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        self._buckets = Counter()
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        # Values up to 1µs share bucket 0
+        bucket = 0
+        if seconds > 1e-6:
+            bucket = math.ceil(math.log(seconds / 1e-6, self.BUCKET_RATIO))
+        self._buckets[bucket] += 1
+        self.count += 1
+
+    def percentile(self, p: float) -> float | None:
+        if not self.count:
+            return None
+        rank = math.ceil(p / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # Upper bound of the bucket
+                return round(1e-6 * self.BUCKET_RATIO ** bucket, 4)
+        return None
+
+    def summary(self) -> dict:
+        return {f"p{p}": self.percentile(p) for p in self.PERCENTILES}
 
 
 def load_questions():
@@ -28,212 +107,436 @@ def load_questions():
     How many matches did Federer win while ranked number 1?
 
     Blank lines and lines starting with # are ignored.
+    The parsed list is cached under STRESS_CACHE_DIR, keyed on a hash of
+    the file contents and STRESS_PARSER_VERSION.
     """
+    source = STRESS_FILE.read_bytes()
+    digest = hashlib.sha256(source)
+    digest.update(f"parser-v{STRESS_PARSER_VERSION}".encode())
+    cache_file = STRESS_CACHE_DIR / f"stress_tests-{digest.hexdigest()[:16]}.pkl"
+    try:
+        return pickle.loads(cache_file.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
     questions = []
     current_meta = {}
 
-    with open(STRESS_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-
-            if not line or line.startswith("#"):
-                continue
-
-            # Metadata line
-            if line.startswith("["):
-                # Example: [L2][temporal-rank]
-                parts = line.replace("]", "").split("[")
-                parts = [p for p in parts if p]
-                current_meta = {
-                    "level": parts[0] if len(parts) > 0 else None,
-                    "tag": parts[1] if len(parts) > 1 else None,
-                }
-                continue
-
-            # Question line
-            questions.append({
-                "question": line,
-                "level": current_meta.get("level"),
-                "tag": current_meta.get("tag")
-            })
-
+    for line in source.decode("utf-8").splitlines():
+        line = line.strip()
+
+        if not line or line.startswith("#"):
+            continue
+
+        # Metadata line, e.g. [L2][temporal-rank]
+        meta = _META_RE.match(line)
+        if meta:
+            current_meta = {"level": meta.group(1), "tag": meta.group(2)}
+            continue
+
+        # Question line
+        questions.append({
+            "question": line,
+            "level": current_meta.get("level"),
+            "tag": current_meta.get("tag")
+        })
+
+    try:
+        STRESS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file.write_bytes(pickle.dumps(questions, protocol=5))
+    except OSError:
+        # Read-only temp dir: parsing again next time is cheap
+        pass
     return questions
 
 
-def benchmark():
-    results = []
-    questions = load_questions()
+# Fixed warm-up work, kept out of the stress set and of the NDJSON entries
+WARMUP_QUESTION = "How many ATP players are there?"
+WARMUP_SQL = "SELECT COUNT(*) FROM players p WHERE p.gender = 'ATP'"
+
+
+def _warm_up_worker(
+    engine: TennisGuruEngine,
+    iterations: int,
+    with_llm: bool,
+    barrier: threading.Barrier,
+) -> tuple[list[float], list[int]]:
+    # Every warm-up task waits here until all are running, so each one
+    # holds a different pool thread (and thread-local connection).
+    try:
+        barrier.wait(timeout=30)
+    except threading.BrokenBarrierError:
+        pass
+
+    llm_times = []
+    sql_times_ns = []
+    for _ in range(iterations):
+        if with_llm:
+            try:
+                # Bypasses the LLM SQL cache: every iteration is a real call
+                _, _, llm_time = generate_sql_from_question(
+                    WARMUP_QUESTION, client=engine.llm_client(), use_cache=False
+                )
+                llm_times.append(llm_time)
+            except Exception:
+                pass
+
+        start = time.perf_counter_ns()
+        try:
+            execute_sql(WARMUP_SQL)
+            sql_times_ns.append(time.perf_counter_ns() - start)
+        except Exception:
+            pass
 
-    print(f"Running benchmark on {len(questions)} questions...\n")
+    return llm_times, sql_times_ns
 
-    engine = TennisGuruEngine()
 
-    for item in questions:
-        q = item["question"]
-        level = item.get("level")
-        tag = item.get("tag")
-
-        print(f"→ [{level}][{tag}] {q}")
-
-        entry = {
-            "question": q,
-            "level": level,
-            "tag": tag,
-            "llm_generation_time": None,
-            "sql_execution_time": None,
-            "simplification_triggered": False,
-            "timeout": False,
-            "error": None,
-            "needs_clarification": False,
-            "generated_sql": None,   # raw SQL from LLM
-            "final_sql": None,       # SQL after guard + transformer
-            "result_sample": None,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+def warm_up(
+    engine: TennisGuruEngine,
+    iterations: int,
+    pool: ThreadPoolExecutor,
+    workers: int,
+) -> dict:
+    """
+    Runs the LLM call and an SQL execution outside the measured loop, so
+    the first entries do not carry cold-start costs (client connection,
+    prompt cache, statement cache, SQLite page cache). The SQL part runs
+    once per pool worker, on the connections the measured questions use;
+    the shared LLM client is warmed by one worker. Failures are ignored:
+    the real questions report them.
+    """
+    if iterations <= 0:
+        return {"iterations": 0, "workers": workers, "llm_generation_times": [], "sql_execution_ns": []}
 
-        try:
-            start_total = time.time()
-            res = engine.process(q)
-            total_time = round(time.time() - start_total, 4)
+    barrier = threading.Barrier(workers)
+    futures = [
+        pool.submit(_warm_up_worker, engine, iterations, i == 0, barrier)
+        for i in range(workers)
+    ]
 
-            # Store both raw LLM SQL and final executed SQL
-            entry["generated_sql"] = getattr(res, "generated_sql", None)
-            entry["final_sql"] = res.sql
+    llm_times = []
+    sql_times_ns = []
+    for future in futures:
+        worker_llm, worker_sql = future.result()
+        llm_times.extend(worker_llm)
+        sql_times_ns.extend(worker_sql)
+
+    return {
+        "iterations": iterations,
+        "workers": workers,
+        "llm_generation_times": llm_times,
+        "sql_execution_ns": sql_times_ns,
+    }
 
-            entry["needs_clarification"] = res.needs_clarification
-            entry["error"] = res.error
 
-            # Timing metrics
-            entry["llm_generation_time"] = getattr(res, "llm_generation_time", None)
-            entry["sql_execution_time"] = total_time
+def _format_percentiles(percentiles: dict) -> str:
+    # None when nothing was recorded (e.g. no question reached the LLM)
+    return ", ".join(
+        f"{name}={'n/a' if value is None else f'{value}s'}"
+        for name, value in percentiles.items()
+    )
 
-            if res.results:
-                entry["result_sample"] = res.results[:3]
 
-        except Exception as e:
-            entry["error"] = str(e)
+def _entry_record(entry: Entry, sql_ids: dict[str, int]) -> dict:
+    """
+    NDJSON form of an entry: generated_sql / final_sql are replaced by ids
+    into sql_ids (the same statement repeats across questions and reruns).
+    """
+    record = asdict(entry)
+    for field in ("generated_sql", "final_sql"):
+        sql = record.pop(field)
+        record[f"{field}_id"] = None if sql is None else sql_ids.setdefault(sql, len(sql_ids))
+    return record
 
-        results.append(entry)
 
-    # -------------------------------
-    # Classification buckets
-    # -------------------------------
-    total_questions = len(results)
+@lru_cache(maxsize=2)
+def get_engine(use_query_cache: bool = False) -> TennisGuruEngine:
+    """
+    Engine shared by every benchmark() call in the process (notebooks,
+    reruns). The question/result caches are off by default: with the
+    on-disk question cache, every run after the first would time cache
+    hits instead of the engine.
+    """
+    return TennisGuruEngine(use_query_cache=use_query_cache)
+
+
+@dataclass(slots=True)
+class Entry:
+    """One benchmark log entry (one NDJSON line)."""
+    question: str
+    level: Optional[str]
+    tag: Optional[str]
+    # Seconds since the run's base_timestamp (see the summary file)
+    t_offset_s: float
+    llm_generation_time: Optional[float] = None
+    # Wall time of engine.process(), in nanoseconds (perf_counter_ns)
+    sql_execution_ns: Optional[int] = None
+    simplification_triggered: bool = False
+    timeout: bool = False
+    error: Optional[str] = None
+    needs_clarification: bool = False
+    # Answered from the question cache
+    cache_hit: bool = False
+    # Raw SQL from LLM
+    generated_sql: Optional[str] = None
+    # SQL after guard + transformer
+    final_sql: Optional[str] = None
+    # Bound values for ? placeholders
+    final_params: Optional[list] = None
+    result_sample: Optional[list] = None
+
+
+def run_one(engine: TennisGuruEngine, item: dict, t0: float) -> Entry:
+    """
+    Runs one stress question through the engine and returns its log entry.
+    t0 is the run's time.monotonic() origin for t_offset_s.
+    """
+    q = item["question"]
+    entry = Entry(
+        question=q,
+        level=item.get("level"),
+        tag=item.get("tag"),
+        t_offset_s=round(time.monotonic() - t0, 6),
+    )
 
-    successes = [
-        r for r in results
-        if r.get("error") is None and not r.get("needs_clarification")
-    ]
+    try:
+        start_total = time.perf_counter_ns()
+        res = engine.process(q)
+        total_ns = time.perf_counter_ns() - start_total
 
-    clarifications = [
-        r for r in results
-        if r.get("needs_clarification") is True
-    ]
+        # Store both raw LLM SQL and final executed SQL
+        entry.generated_sql = res.generated_sql
+        entry.final_sql = res.sql
+        entry.final_params = list(res.params)
 
-    timeouts = [
-        r for r in results
-        if r.get("timeout") is True
-    ]
+        entry.needs_clarification = res.needs_clarification
+        entry.cache_hit = res.cached
+        entry.timeout = res.timed_out
+        entry.error = res.error
 
-    interruptions = [
-        r for r in results
-        if r.get("error") == "interrupted"
-    ]
+        # Timing metrics
+        entry.llm_generation_time = res.llm_generation_time
+        entry.sql_execution_ns = total_ns
 
-    sql_errors = [
-        r for r in results
-        if r.get("error") is not None
-        and not r.get("needs_clarification")
-        and r.get("error") != "interrupted"
-    ]
+        if res.results:
+            entry.result_sample = res.results[:3]
+
+    except Exception as e:
+        entry.error = str(e)
+
+    return entry
+
+
+def benchmark(
+    concurrency: int = 1,
+    in_memory: bool = False,
+    warmup_iters: int = 1,
+    query_cache: bool = False,
+):
+    questions = load_questions()
+
+    print(f"Running benchmark on {len(questions)} questions (concurrency={concurrency})...\n")
+
+    # One engine shared by every worker; each worker thread queries through
+    # its own read-only connection to the DB.
+    engine = get_engine(use_query_cache=query_cache)
+
+    if in_memory:
+        # The engine never creates indexes (rebuild_snapshot does), so make
+        # sure they exist on disk before the copy; no-op once they do.
+        ensure_indexes()
+        load_into_memory()
+
+    # Created before the warm-up so it warms the same worker threads
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    warmup = warm_up(engine, warmup_iters, pool, concurrency)
+
+    # Wall-clock time recorded once; entries carry monotonic offsets from it
+    t0 = time.monotonic()
+    base_timestamp = datetime.utcnow().isoformat()
 
-    executable_total = total_questions - len(clarifications)
+    # Identical questions (e.g. listed under several tags) run once
+    groups = {}
+    for item in questions:
+        groups.setdefault(item["question"], []).append(item)
+    duplicates_collapsed = len(questions) - len(groups)
 
     # -------------------------------
-    # Timing metrics (only successes)
+    # Running counters (entries are not kept in memory)
     # -------------------------------
-    avg_llm_time = (
-        round(
-            sum(r["llm_generation_time"] or 0 for r in successes)
-            / len(successes),
-            4,
-        )
-        if successes else 0
-    )
+    total_questions = 0
+    successes = 0
+    clarifications = 0
+    timeouts = 0
+    interruptions = 0
+    sql_errors = 0
+    cache_hits = 0
+    llm_time_sum = 0.0
+    sql_ns_sum = 0
+    # Min-heap of (execution time, order, question): the 3 slowest successes
+    slowest = []
+    llm_latency = LatencyHistogram()
+    sql_latency = LatencyHistogram()
+    # Distinct SQL texts -> id; written once as sql_table in the summary file
+    sql_ids = {}
+
+    # Each entry is written as one NDJSON line as soon as it finishes, so a
+    # crash mid-run keeps everything answered so far.
+    with pool, open(RESULTS_FILE, "wb") as out:
+        futures = {
+            pool.submit(run_one, engine, items[0], t0): items
+            for items in groups.values()
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            # Same answer logged once per occurrence, with that item's labels
+            for item in futures[future]:
+                r = replace(result, level=item.get("level"), tag=item.get("tag"))
+                print(f"→ [{r.level}][{r.tag}] {r.question}")
+                out.write(_ndjson_line(_entry_record(r, sql_ids)))
+                out.flush()
+
+                # -------------------------------
+                # Classification buckets
+                # -------------------------------
+                total_questions += 1
+                error = r.error
+                needs_clarification = r.needs_clarification
+
+                if needs_clarification:
+                    clarifications += 1
+                if r.cache_hit:
+                    cache_hits += 1
+                if r.timeout:
+                    timeouts += 1
+                elif error == "interrupted":
+                    interruptions += 1
+                elif error is not None and not needs_clarification:
+                    sql_errors += 1
+
+                if error is None and not needs_clarification:
+                    successes += 1
+                    llm_time_sum += r.llm_generation_time or 0
+                    sql_ns = r.sql_execution_ns or 0
+                    sql_ns_sum += sql_ns
+                    # LLM percentiles cover questions that actually called the LLM
+                    if r.llm_generation_time is not None:
+                        llm_latency.record(r.llm_generation_time)
+                    sql_latency.record(sql_ns / 1e9)
+                    heapq.heappush(slowest, (sql_ns, -total_questions, r.question))
+                    if len(slowest) > 3:
+                        heapq.heappop(slowest)
+
+    executable_total = total_questions - clarifications
 
-    avg_sql_time = (
-        round(
-            sum(r["sql_execution_time"] or 0 for r in successes)
-            / len(successes),
-            4,
-        )
-        if successes else 0
-    )
+    # -------------------------------
+    # Timing metrics (only successes)
+    # -------------------------------
+    avg_llm_time = round(llm_time_sum / successes, 4) if successes else 0
+    avg_sql_time = round(sql_ns_sum / successes / 1e9, 4) if successes else 0
 
-    slowest = sorted(
-        successes,
-        key=lambda x: x.get("sql_execution_time") or 0,
-        reverse=True,
-    )[:3]
+    slowest = [
+        {"question": question, "execution_time": round(sql_ns / 1e9, 4)}
+        for sql_ns, _, question in sorted(slowest, reverse=True)
+    ]
 
     print("\n==============================")
     print("Benchmark Summary")
     print("==============================")
     print(f"Total questions: {total_questions}")
-    print(f"Successful executions: {len(successes)}")
-    print(f"Clarifications (expected behavior): {len(clarifications)}")
-    print(f"SQL errors: {len(sql_errors)}")
-    print(f"Timeouts: {len(timeouts)}")
-    print(f"Interrupted executions: {len(interruptions)}")
+    print(f"Successful executions: {successes}")
+    print(f"Clarifications (expected behavior): {clarifications}")
+    print(f"SQL errors: {sql_errors}")
+    print(f"Timeouts: {timeouts}")
+    print(f"Interrupted executions: {interruptions}")
+    print(f"Question cache hits: {cache_hits}")
+    print(f"Duplicate questions collapsed: {duplicates_collapsed}")
 
     if executable_total > 0:
-        success_rate = len(successes) / executable_total
+        success_rate = successes / executable_total
         print(f"Executable success rate: {success_rate:.2%}")
 
     print(f"Average LLM generation time: {avg_llm_time}s")
     print(f"Average total execution time: {avg_sql_time}s")
 
+    llm_percentiles = llm_latency.summary()
+    sql_percentiles = sql_latency.summary()
+    print(f"LLM generation time percentiles: {_format_percentiles(llm_percentiles)}")
+    print(f"Total execution time percentiles: {_format_percentiles(sql_percentiles)}")
+
     print("\nTop 3 slowest queries:")
     for r in slowest:
-        print(f" - {r['question']} ({r.get('sql_execution_time')}s)")
+        print(f" - {r['question']} ({r['execution_time']}s)")
 
     # -------------------------------
     # Build summary object
     # -------------------------------
     summary = {
         "total_questions": total_questions,
-        "successful_executions": len(successes),
-        "clarifications": len(clarifications),
-        "sql_errors": len(sql_errors),
-        "timeouts": len(timeouts),
-        "interruptions": len(interruptions),
+        "successful_executions": successes,
+        "clarifications": clarifications,
+        "sql_errors": sql_errors,
+        "timeouts": timeouts,
+        "interruptions": interruptions,
+        "cache_hits": cache_hits,
+        "duplicates_collapsed": duplicates_collapsed,
         "executable_success_rate": (
-            round(len(successes) / executable_total, 4)
+            round(successes / executable_total, 4)
             if executable_total > 0 else None
         ),
         "average_llm_generation_time": avg_llm_time,
         "average_total_execution_time": avg_sql_time,
-        "top_3_slowest": [
-            {
-                "question": r["question"],
-                "execution_time": r.get("sql_execution_time")
-            }
-            for r in slowest
-        ]
+        "llm_generation_time_percentiles": llm_percentiles,
+        "total_execution_time_percentiles": sql_percentiles,
+        "top_3_slowest": slowest,
     }
 
-    # Persist full benchmark report
+    # Summary report; per-question entries live in RESULTS_FILE
     report = {
         "summary": summary,
-        "results": results
+        "base_timestamp": base_timestamp,
+        "warmup": warmup,
+        "results_file": RESULTS_FILE.name,
+        # Indexed by the entries' generated_sql_id / final_sql_id
+        "sql_table": list(sql_ids),
     }
 
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+    LOG_FILE.write_bytes(_pretty_json(report))
 
     print("\nBenchmark complete.")
-    print(f"Results saved to {LOG_FILE}")
+    print(f"Summary saved to {LOG_FILE}")
+    print(f"Per-question results saved to {RESULTS_FILE}")
 
 
 if __name__ == "__main__":
-    benchmark()
+    parser = argparse.ArgumentParser(description="Run the stress-test benchmark.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="questions processed in parallel (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="copy the database into RAM before running (no disk reads while timing)",
+    )
+    parser.add_argument(
+        "--warmup-iters",
+        type=int,
+        default=1,
+        help="untimed warm-up runs (one LLM call + one query) before the benchmark (default: 1)",
+    )
+    parser.add_argument(
+        "--query-cache",
+        action="store_true",
+        help="keep the engine's question/result caches on (warm-cache latencies; "
+             "off by default so every run times the full pipeline)",
+    )
+    args = parser.parse_args()
+    benchmark(
+        concurrency=max(1, args.concurrency),
+        in_memory=args.in_memory,
+        warmup_iters=max(0, args.warmup_iters),
+        query_cache=args.query_cache,
+    )
@@ -0,0 +1,61 @@
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core import cache
+from src.core.cache import PersistentQueryCache, canonical_key
+
+ENTRY = {
+    "sql": "SELECT COUNT(*) FROM matches WHERE tourney_name = ?",
+    "params": ("Wimbledon",),
+    "results": [(7,)],
+    "truncated": False,
+}
+
+
+def test_articles_share_a_key():
+    assert canonical_key("Who won the Open in 1968?") == canonical_key("who won Open in 1968")
+    assert canonical_key("¿Cuántos títulos ganó el Nadal?") == canonical_key("cuantos titulos gano Nadal")
+
+
+def test_filler_removal_keeps_meaningful_words():
+    assert canonical_key("Who won the US Open?") != canonical_key("Who won the Open?")
+    assert canonical_key("Who won the Open before 2000?") != canonical_key("Who won the Open?")
+    assert canonical_key("Did Nadal beat Federer?") != canonical_key("Did Federer beat Nadal?")
+
+
+@pytest.fixture
+def source_db(tmp_path):
+    path = tmp_path / "guru.db"
+    path.write_bytes(b"")
+    os.utime(path, (1_000_000, 1_000_000))
+    return path
+
+
+def test_disk_entry_survives_a_new_instance(tmp_path, source_db):
+    PersistentQueryCache(tmp_path / "cache.db", source_db=source_db).put("Q?", ENTRY)
+    entry = PersistentQueryCache(tmp_path / "cache.db", source_db=source_db).get("q")
+    assert entry == ENTRY
+
+
+def test_db_mtime_change_invalidates(tmp_path, source_db):
+    query_cache = PersistentQueryCache(tmp_path / "cache.db", source_db=source_db)
+    query_cache.put("Q?", ENTRY)
+    assert query_cache.get("Q?") == ENTRY
+
+    os.utime(source_db, (2_000_000, 2_000_000))
+    # Both the memory tiers and the disk row are stale now.
+    assert query_cache.get("Q?") is None
+    assert PersistentQueryCache(tmp_path / "cache.db", source_db=source_db).get("Q?") is None
+
+
+def test_schema_version_change_invalidates(tmp_path, source_db, monkeypatch):
+    PersistentQueryCache(tmp_path / "cache.db", source_db=source_db).put("Q?", ENTRY)
+
+    monkeypatch.setattr(cache, "SCHEMA_VERSION", "another-schema")
+    assert PersistentQueryCache(tmp_path / "cache.db", source_db=source_db).get("Q?") is None
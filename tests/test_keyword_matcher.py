@@ -0,0 +1,34 @@
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.keyword_matcher import KeywordMatcher
+
+
+def test_prefix_keyword_reports_both_buckets():
+    matcher = KeywordMatcher({"final": {"final"}, "finals": {"finals"}})
+    assert matcher.scan("how many finals did he play") == {"final", "finals"}
+    assert matcher.scan("the final in 2008") == {"final"}
+
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher({"major": {"us open"}, "era": {"open era"}})
+    assert matcher.scan("best us open era champion") == {"major", "era"}
+
+
+def test_keyword_inside_longer_keyword():
+    matcher = KeywordMatcher({"record": {"record"}, "most": {"most wins record"}})
+    assert matcher.scan("most wins record holder") == {"record", "most"}
+
+
+def test_keyword_shared_by_buckets():
+    matcher = KeywordMatcher({"a": {"grand slam"}, "b": {"grand slam", "major"}})
+    assert matcher.scan("grand slam titles") == {"a", "b"}
+    assert matcher.scan("no keywords here") == frozenset()
+
+
+def test_matching_is_substring_not_word():
+    matcher = KeywordMatcher({"win": {"win"}})
+    assert matcher.scan("winner") == {"win"}
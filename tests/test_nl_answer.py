@@ -0,0 +1,42 @@
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.llm_generator import generate_nl_answer
+
+
+def test_unit_is_the_counted_noun_not_the_round():
+    question = "How many aces did Isner hit in Wimbledon finals?"
+    assert generate_nl_answer(question, 7) == "Resultado: 7 aces."
+
+
+def test_matches_in_finals_are_matches():
+    question = "How many matches did Federer win in finals?"
+    assert generate_nl_answer(question, 7) == "Resultado: 7 partidos."
+
+
+def test_finals_counted_directly():
+    question = "How many finals did Andy Murray play?"
+    assert generate_nl_answer(question, 3) == "Resultado: 3 finales."
+
+
+def test_grand_slam_count_uses_generic_template():
+    question = "How many Grand Slam titles did Roger Federer win?"
+    assert generate_nl_answer(question, 20) == "Resultado: 20 torneos de Grand Slam."
+
+
+def test_year_is_not_labelled():
+    question = "In what year did Federer win his first title?"
+    assert generate_nl_answer(question, 2001) == "2001"
+
+
+def test_age_is_not_labelled():
+    question = "How old was Nadal when he won his first Grand Slam?"
+    assert generate_nl_answer(question, 19) == "19"
+
+
+def test_percentage_is_not_labelled():
+    question = "What percentage of finals did Nadal win?"
+    assert generate_nl_answer(question, 68) == "68"
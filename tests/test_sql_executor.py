@@ -0,0 +1,72 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core import sql_executor
+from src.core.schema import reload_schema
+from src.core.sql_executor import parameterize_literals, validate_statement
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "guru.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE matches (tourney_name TEXT, match_date TEXT)")
+    conn.close()
+    reload_schema()
+    yield path
+    reload_schema()
+
+
+def test_strftime_format_is_parameterized():
+    sql = "SELECT strftime('%Y', m.match_date) FROM matches m WHERE m.tourney_name = 'Wimbledon'"
+    template, params = parameterize_literals(sql)
+    assert template == "SELECT strftime(?, m.match_date) FROM matches m WHERE m.tourney_name = ?"
+    assert params == ("%Y", "Wimbledon")
+
+
+def test_escaped_quote_is_unescaped_in_param():
+    template, params = parameterize_literals("SELECT 1 FROM players WHERE last_name = 'O''Connell'")
+    assert template == "SELECT 1 FROM players WHERE last_name = ?"
+    assert params == ("O'Connell",)
+
+
+def test_like_pattern_keeps_wildcards():
+    template, params = parameterize_literals("SELECT 1 FROM matches WHERE tourney_name LIKE '%Open%'")
+    assert template == "SELECT 1 FROM matches WHERE tourney_name LIKE ?"
+    assert params == ("%Open%",)
+
+
+def test_aliases_comments_and_identifiers_are_untouched():
+    sql = "SELECT COUNT(*) AS 'wins', \"tourney_name\" FROM matches -- 'note'\nWHERE surface = 'Clay'"
+    template, params = parameterize_literals(sql)
+    assert template == sql.replace("'Clay'", "?")
+    assert params == ("Clay",)
+
+
+def test_validation_failures_are_not_memoized(db_path):
+    sql = "SELECT m.surface FROM matches m"
+    before = len(sql_executor._VALIDATED_SQL)
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Unknown columns"):
+            validate_statement(sql, db_path)
+    assert len(sql_executor._VALIDATED_SQL) == before
+
+    # Once the column exists the same statement passes.
+    conn = sqlite3.connect(db_path)
+    conn.execute("ALTER TABLE matches ADD COLUMN surface TEXT")
+    conn.close()
+    reload_schema()
+    validate_statement(sql, db_path)
+    assert len(sql_executor._VALIDATED_SQL) == 1
+
+
+def test_forbidden_statement_fails_every_time(db_path):
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Only SELECT"):
+            validate_statement("DELETE FROM matches", db_path)